@@ -11,16 +11,28 @@ Missing Features
 v0.2 - WIP created on 10/24 by Bert Van Overmeir for EDF.
 """
 
-from inspect import Attribute
-from pydoc import doc
-from typing import Any, List, TYPE_CHECKING, cast
+import time
+MODULE_LOAD_STARTED = time.perf_counter() # start-up report, see create_interactor
+
+# NumPy, the process pool, pickle and the profiler are imported by the stages that use them, not when the wizard starts
+from typing import Any, Iterable, List, TYPE_CHECKING, cast
 from enum import Enum
 from pathlib import Path
-import numpy as np
 import os
+import sys
 import datetime
-import re
-import math
+import json
+import codecs
+from itertools import chain, islice
+if TYPE_CHECKING: # only for the annotation of save_profile
+    import cProfile
+
+# the parser has no Allplan imports, the worker processes of the parallel parse import it from this folder
+WIZARD_FOLDER = str(Path(__file__).resolve().parent)
+if WIZARD_FOLDER not in sys.path:
+    sys.path.append(WIZARD_FOLDER)
+import bvbs_parser as BVBSParser
+from bvbs_parser import (AttributePreference, BVBSFileReader, RebarElementAttribute, RebarTable, RebarTableRow, RunCancelledError, ShapeType)
 
 import NemAll_Python_IFW_ElementAdapter as AllplanElementAdapter
 import NemAll_Python_IFW_Input as AllplanIFW
@@ -28,7 +40,6 @@ import NemAll_Python_BaseElements as AllplanBaseElements
 import NemAll_Python_Utility as AllplanUtil
 import NemAll_Python_AllplanSettings as AllplanSettings
 import NemAll_Python_Reinforcement as AllplanReinforcement
-from ServiceExamples import AttributeService
 import Utils as Utils
 import BuildingElementStringTable as BuildingElementStringTable
 import AnyValueByType as AnyValueByType
@@ -79,6 +90,7 @@ class Event(Enum):
     NO_EVENT = 0
     USER_START_EXPORT = 1
     USER_CONFIRM_EXPORT = 2
+    USER_RUN_IFC_EXPORT = 3
 
 
 class EventOrigin(Enum):
@@ -89,11 +101,6 @@ class EventOrigin(Enum):
     OTHER = 4
 
 
-class ShapeType(Enum):
-    SHAPE2D = 0
-    SHAPE3D = 1
-
-
 class BMWizardInfo(Enum):
     ERR_CREATING_NEW_ATTRIBUTES = 0
     ERR_ATTRIBUTES_ASSIGNMENT_FAILED = 1
@@ -112,6 +119,14 @@ class BMWizardInfo(Enum):
     INFO_EXPORT_IFC = 18
     INFO_FINISHED = 19
     INFO_PREPARING_DATA = 20
+    INFO_RUN_CANCELLED = 21
+
+
+class IfcExportState(Enum):
+    QUEUED = 0
+    FINISHED = 1
+    FAILED = 2
+    CANCELLED = 3
 
 
 class SelectionType(Enum):
@@ -165,6 +180,10 @@ class BendingMachineWizardInteractor():
         self.user_message        = ""
         self.is_second_input_point = False
         self.ctrl_prop_util      = None
+        # start-up report: loading the module and showing the palette, until the user can click
+        self.startup_timer = StageTimer()
+        self.startup_timer.add("module load", MODULE_LOAD_SECONDS)
+        self.startup_timer.start("first palette render")
         # start palette VIS
         self.palette_service = BuildingElementPaletteService(self.build_ele_list, self.build_ele_composite,
                                                              self.build_ele_list[0].script_name,
@@ -179,24 +198,85 @@ class BendingMachineWizardInteractor():
         self.set_tab_status_startup()
         AllplanHelpers.static_init(self.coord_input, local_str_table)
         AllplanHelpers.show_message_in_taskbar(AllplanHelpers.get_message(BMWizardInfo.INFO_IDLE))
+        self.startup_timer.stop()
         # init variables for events
         self.attribute_settings = None
         self.selected_elements = None
         self.assembly_match_table = None
+        self.assembly_name_by_uuid = None
         self.created_rebar = None
+        self.assembly_amount_totals = None
+        self.assembly_amount_report = None
+        self.parse_snapshot = None
+        self.parse_snapshot_path = None
+        self.rebar_to_write = None
+        self.stage_timer = None
+        self.profiler = None
+        self.profile_path = None
+        self.file_list_version = None
+        self.ifc_export_queue = IfcExportQueue()
 
     def on_control_event(self, event_id):
         """ control the different ID's that can be called via buttons.
         """
         self.palette_service.on_control_event(event_id)
+        # the loaded drawing files are read once per button click, the run and the IFC export use this state
+        AllplanHelpers.refresh_drawing_file_catalogue()
+        self.update_file_list()
         self.palette_service.update_palette(-1, True)
         self.set_event(Event(event_id))
-        ok = self.event_do(Event(event_id), EventOrigin.BUTTONCLICK)
+        try:
+            ok = self.event_do_profiled(Event(event_id), EventOrigin.BUTTONCLICK)
+        except RunCancelledError:
+            # the snapshot of an incremental run is not saved, the next run starts again from the export
+            AllplanHelpers.finite_progressbar_stop()
+            AllplanUtil.ShowMessageBox(AllplanHelpers.get_message(BMWizardInfo.INFO_RUN_CANCELLED), AllplanUtil.MB_OK)
+            self.ctrl_prop_util.set_enable_function("yesbutton", self.disable_variable_function)
+            self.build_ele_list[0].text_info_user.value = "Cancelled"
+            ok = True
+        if(AllplanHelpers.run_progress is not None):
+            AllplanHelpers.run_progress = None
+            AllplanHelpers.finite_progressbar_stop()
         AllplanHelpers.show_message_in_taskbar(AllplanHelpers.get_message(BMWizardInfo.INFO_IDLE))
         if not ok:
             self.ctrl_prop_util.set_enable_function("yesbutton", self.disable_variable_function)
             self.build_ele_list[0].text_info_user.value = "Error"
             AllplanHelpers.finite_progressbar_stop()
+        self.update_ifc_export_status()
+
+    def update_ifc_export_status(self):
+        """ Shows the state of the queued IFC export, the palette is only redrawn when the state changed """
+        status_text = self.ifc_export_queue.get_status_text()
+        if status_text is None:
+            return
+        if self.build_ele_list[0].text_ifc_export_status.value != status_text:
+            self.build_ele_list[0].text_ifc_export_status.value = status_text
+            self.palette_service.update_palette(-1, False)
+
+    def start_stage(self, stage: str, total_items: int = None):
+        """ Times the stage and shows it in the progress bar, a cancelled run stops here at the latest """
+        AllplanHelpers.progress_stage(stage, total_items)
+        self.stage_timer.start(stage)
+
+    def event_do_profiled(self,
+                          event       : Event,
+                          event_origin: EventOrigin):
+        """ event_do, profiled when the palette option or the environment variable is set.
+            A run starts with USER_START_EXPORT and ends with USER_CONFIRM_EXPORT, both are collected in the same profile.
+            The profile is saved after each of them, so it is also available when the user never confirms.
+        """
+        if(event not in (Event.USER_START_EXPORT, Event.USER_CONFIRM_EXPORT) or not AllplanHelpers.is_profiling_enabled(self.build_ele_list[0])):
+            return self.event_do(event, event_origin)
+        if(event == Event.USER_START_EXPORT or self.profiler is None):
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profile_path = AllplanHelpers.get_profile_path()
+        self.profiler.enable()
+        try:
+            return self.event_do(event, event_origin)
+        finally:
+            self.profiler.disable()
+            AllplanHelpers.save_profile(self.profiler, self.profile_path)
 
     def disable_variable_function(self) -> bool:
         return False
@@ -290,15 +370,34 @@ class BendingMachineWizardInteractor():
             event_origin: Origin from where the event is fired defined by EventOrigin Enum
         """
         self.set_selection_mode(SelectionType.NONE)
+        if event == Event.USER_RUN_IFC_EXPORT:
+            if(event_origin == EventOrigin.BUTTONCLICK):
+                # the queued exports run on this event, the palette shows their result once the last one is done
+                AllplanHelpers.run_progress = RunProgress()
+                AllplanHelpers.progress_stage("IFC export", len(self.ifc_export_queue.jobs))
+                while self.ifc_export_queue.run_next():
+                    AllplanHelpers.progress_step()
+                AllplanHelpers.finite_progressbar_stop()
+                return True
+
         if event == Event.USER_CONFIRM_EXPORT:
             if(event_origin == EventOrigin.BUTTONCLICK):
-                AllplanHelpers.finite_progressbar_create(len(self.created_rebar), "processing", "")
-                # write everything to Allplan
-                ok, err_msg = AllplanHelpers.write_attributes_to_allplan(self.created_rebar, self.build_ele_list[0].CheckBoxTimestampAttribute.value)
+                AllplanHelpers.run_progress = RunProgress()
+                # write everything to Allplan, in the incremental mode only the bars that changed since the previous run
+                self.start_stage("write attributes", len(self.rebar_to_write))
+                ok, err_msg = AllplanHelpers.write_attributes_to_allplan(self.rebar_to_write, self.build_ele_list[0].CheckBoxTimestampAttribute.value, self.build_ele_list[0].CheckBoxDeltaWrite.value)
+                self.stage_timer.stop(len(self.rebar_to_write), "bars")
                 if(not ok):
                     AllplanUtil.ShowMessageBox(AllplanHelpers.get_message(BMWizardInfo.ERR_ATTRIBUTES_ASSIGNMENT_FAILED) + "\n" + err_msg, AllplanUtil.MB_OK)
                     return None
 
+                # the snapshot is only saved once the attributes are written, the next run compares against what is in Allplan
+                if(self.parse_snapshot is not None):
+                    try:
+                        self.parse_snapshot.save(self.parse_snapshot_path)
+                    except Exception as exc:
+                        AllplanHelpers.log("save parse snapshot", str(exc), False)
+
                 # create an IFC file if necessary
                 if(self.build_ele_list[0].CheckBoxCreateIFC.value == 1):
                     ifc_path = self.build_ele_list[0].filepathIfc.value
@@ -309,12 +408,25 @@ class BendingMachineWizardInteractor():
                         AllplanUtil.ShowMessageBox(AllplanHelpers.get_message(BMWizardInfo.ERR_IFC_PATH_INVALID), AllplanUtil.MB_OK)
                         return None
 
-                    ok = AllplanHelpers.export_ifc_data(ifc_drawingfiles, ifc_path, AllplanBaseElements.IFC_Version.Ifc_4, ifc_theme)
-                    if(not ok):
-                        AllplanUtil.ShowMessageBox(AllplanHelpers.get_message(BMWizardInfo.ERR_IFC_EXPORT_FAILED), AllplanUtil.MB_OK)
-                        return None
-
+                    if(self.build_ele_list[0].CheckBoxBackgroundIfcExport.value):
+                        # the attributes are written, the export is queued and runs with "Export now" in the summary tab, its state is shown there
+                        self.ifc_export_queue.add(IfcExportJob(AllplanBaseElements.ExportImportService(), AllplanHelpers.doc, ifc_drawingfiles, ifc_path,
+                                                               AllplanBaseElements.IFC_Version.Ifc_4, ifc_theme))
+                        self.update_ifc_export_status()
+                    else:
+                        self.start_stage("IFC export")
+                        ok = AllplanHelpers.export_ifc_data(ifc_drawingfiles, ifc_path, AllplanBaseElements.IFC_Version.Ifc_4, ifc_theme)
+                        self.stage_timer.stop(len(ifc_drawingfiles), "drawing files")
+                        if(not ok):
+                            AllplanUtil.ShowMessageBox(AllplanHelpers.get_message(BMWizardInfo.ERR_IFC_EXPORT_FAILED), AllplanUtil.MB_OK)
+                            return None
+
+                # the write stage adds its own report entries
+                AllplanHelpers.fill_data_summary_tab(self.ctrl_prop_util, self.build_ele_list[0], self.assembly_amount_report + self.startup_timer.get_report_elements("Startup ") + self.stage_timer.get_report_elements())
+                if(self.build_ele_list[0].CheckBoxTimingTrace.value):
+                    AllplanHelpers.save_stage_trace(self.stage_timer, self.startup_timer)
                 self.build_ele_list[0].text_info_user.value = "OK"
+                self.palette_service.update_palette(-1, False)
                 self.ctrl_prop_util.set_enable_function("yesbutton", self.disable_variable_function)
                 AllplanHelpers.finite_progressbar_stop()
                 return True
@@ -322,69 +434,114 @@ class BendingMachineWizardInteractor():
         if event == Event.USER_START_EXPORT:
             if(event_origin == EventOrigin.BUTTONCLICK):
                 AllplanHelpers.show_message_in_taskbar(AllplanHelpers.get_message(BMWizardInfo.INFO_PREPARING_DATA))
+                # attribute definitions are cached for this run only, the user may have changed them in between
+                AllplanHelpers.attribute_catalogue = AttributeCatalogue()
+                self.stage_timer = StageTimer()
+                AllplanHelpers.run_progress = RunProgress()
 
                 # get user preferences
+                self.start_stage("attribute settings")
                 ok, self.attribute_settings = AllplanHelpers.get_user_attribute_settings(self.build_ele_list[0])
+                self.stage_timer.stop()
                 if(not ok):
                     AllplanUtil.ShowMessageBox(AllplanHelpers.get_message(BMWizardInfo.ERR_ATTRIBUTES_UNDEFINED_IN_UI), AllplanUtil.MB_OK)
                     return None
 
                 # select all elements in the drawing
+                self.start_stage("select drawing elements")
                 ok, self.selected_elements = AllplanHelpers.select_drawing_elements()
+                self.stage_timer.stop(len(self.selected_elements or []), "elements")
                 if(not ok):
                     AllplanUtil.ShowMessageBox(AllplanHelpers.get_message(BMWizardInfo.ERR_SELECTION_FAILED), AllplanUtil.MB_OK)
                     return None
 
                 # check for assemblies and save the information in a table
                 # if there are no assemblies, it will just generate an empty list.
-                self.assembly_match_table = AllplanHelpers.get_assembly_information_from_selection(self.selected_elements)
+                self.start_stage("assembly information")
+                self.assembly_match_table, self.assembly_name_by_uuid = AllplanHelpers.get_assembly_information_from_selection(self.selected_elements)
+                self.stage_timer.stop(len(self.assembly_match_table), "assemblies")
 
                 # filter for rebar elements in selection
+                self.start_stage("filter bar placements", len(self.selected_elements))
                 ok, self.selected_elements = AllplanHelpers.filter_drawing_elements_for_rebar(self.selected_elements)
+                self.stage_timer.stop(len(self.selected_elements or []), "placements")
                 if(not ok):
                     AllplanUtil.ShowMessageBox(AllplanHelpers.get_message(BMWizardInfo.ERR_INVALID_IFC_TYPE_OR_MISSING), AllplanUtil.MB_OK)
                     return None
 
                 # export the bending machine files to the TMP Allplan folder
-                ok = AllplanHelpers.export_bending_machine_files(AllplanSettings.AllplanPaths.GetUsrPath() + "tmp\\bendtemp.bvbs")
+                self.start_stage("BVBS export")
+                ok = AllplanHelpers.export_bending_machine_files(AllplanHelpers.get_bvbs_temp_path())
+                self.stage_timer.stop()
                 if(not ok):
                     AllplanUtil.ShowMessageBox(AllplanHelpers.get_message(BMWizardInfo.ERR_GENERAL_EXPORT_BVBS_ERROR), AllplanUtil.MB_OK)
                     return None
 
-                # import the bending machine files again
-                ok, imported_bvbs_information = AllplanHelpers.import_bending_machine_files(AllplanSettings.AllplanPaths.GetUsrPath() + "tmp\\bendtemp.bvbs")
+                # in the incremental mode the previous run on this document is loaded, only new and changed lines are parsed
+                self.parse_snapshot = None
+                if(self.build_ele_list[0].CheckBoxIncrementalRun.value):
+                    snapshot_key = AllplanHelpers.get_parse_snapshot_key(AllplanHelpers.get_bvbs_temp_path())
+                    self.parse_snapshot_path = AllplanHelpers.get_parse_snapshot_path(snapshot_key)
+                    self.parse_snapshot = ParseSnapshot.load(self.parse_snapshot_path, self.attribute_settings, snapshot_key)
+
+                # import the bending machine files again, the reader only opens the file: the lines are read while they are parsed,
+                # so reading and parsing are one stage
+                self.stage_timer.start("read and parse BVBS")
+                ok, imported_bvbs_information = AllplanHelpers.import_bending_machine_files(AllplanHelpers.get_bvbs_temp_path())
                 if(not ok):
+                    self.stage_timer.stop()
                     AllplanUtil.ShowMessageBox(AllplanHelpers.get_message(BMWizardInfo.ERR_GENERAL_IMPORT_BVBS_ERROR), AllplanUtil.MB_OK)
                     return None
 
                 # write bvbs data to RebarElements with (most) Allplan attributes assigned
-                ok, created_rebar = AllplanHelpers.create_rebar_from_bending_machine_files(imported_bvbs_information, self.attribute_settings)
+                # the parsed bars go through the pipeline while the next lines are parsed: angles and lengths do not have user defined
+                # attributes, they are named on the fly and created once all lines are parsed, the bars are indexed for the matching
+                rebar_pipeline = RebarPipeline(self.attribute_settings, AllplanBaseElements.AttributeService.AttributeType.Double)
+                AllplanHelpers.progress_stage("read and parse BVBS", imported_bvbs_information.get_line_count())
+                ok, created_rebar = AllplanHelpers.create_rebar_from_bending_machine_files(imported_bvbs_information, self.attribute_settings, self.build_ele_list[0].CheckBoxParallelParsing.value,
+                                                                                           self.parse_snapshot, rebar_pipeline)
+                self.stage_timer.stop(len(created_rebar) if ok else None, "bars")
                 if(not ok):
                     AllplanUtil.ShowMessageBox(AllplanHelpers.get_message(BMWizardInfo.ERR_GENERAL_PARSING_ERROR) + "\n" + AllplanHelpers.get_exception_message(created_rebar), AllplanUtil.MB_OK)
                     return None
-
-                # angles and lengths do not have user defined attributes and should be created on the fly.
-                ok, created_rebar = AllplanHelpers.set_create_segment_angles_lengths_attributes(created_rebar, self.attribute_settings)
-                if(not ok):
+                if(not rebar_pipeline.segment_attributes_ok):
                     AllplanUtil.ShowMessageBox(AllplanHelpers.get_message(BMWizardInfo.ERR_CREATING_NEW_ATTRIBUTES), AllplanUtil.MB_OK)
                     return None
 
                 # match rebar elements and allplan data, assembly data needed for correct matching of assembly ID's
-                ok, self.created_rebar, unassigned_marks = AllplanHelpers.set_corresponding_elements_on_rebarelements(created_rebar, self.selected_elements, self.assembly_match_table)
+                self.start_stage("match placements", len(self.selected_elements))
+                ok, self.created_rebar, unassigned_marks = AllplanHelpers.set_corresponding_elements_on_rebarelements(created_rebar, self.selected_elements, self.assembly_name_by_uuid,
+                                                                                                                      rebar_pipeline.rebar_index)
+                self.stage_timer.stop(len(self.selected_elements), "placements")
                 if(not ok):
                     missing_marks = " - ".join(unassigned_marks)
                     AllplanUtil.ShowMessageBox(AllplanHelpers.get_message(BMWizardInfo.ERR_MATCHING_ALLPLAN_DATA, missing_marks), AllplanUtil.MB_OK)
 
                 # in case of couplers, adjust bar lengths
+                self.start_stage("coupler lengths", len(created_rebar))
                 ok = AllplanHelpers.adjust_rebar_lengths_for_bars_with_couplers(created_rebar)
+                self.stage_timer.stop(len(created_rebar), "bars")
                 if(not ok):
                     AllplanUtil.ShowMessageBox(AllplanHelpers.get_message(BMWizardInfo.ERR_COUPLER_MATCHING), AllplanUtil.MB_OK)
 
                 # calculate total amount of rebar in case of assemblies
-                self.created_rebar = AllplanHelpers.calculate_total_rebar_amounts_for_assemblies(self.created_rebar, self.attribute_settings)
+                self.start_stage("assembly totals")
+                self.created_rebar, self.assembly_amount_totals = AllplanHelpers.calculate_total_rebar_amounts_for_assemblies(self.created_rebar, self.attribute_settings)
+                self.stage_timer.stop(len(self.created_rebar), "bars")
+                self.assembly_amount_report = [ReportElement("Total amount assembly mark " + str(mark), str(amount)) for mark, amount in self.assembly_amount_totals.items()]
+
+                # bars with the same attributes and Allplan elements as in the previous run are not written again
+                self.rebar_to_write = self.created_rebar
+                if(self.parse_snapshot is not None):
+                    self.start_stage("compare with previous run")
+                    self.rebar_to_write = self.parse_snapshot.get_rebar_to_write(self.created_rebar)
+                    self.stage_timer.stop(len(self.created_rebar), "bars")
+                    ReportHelper.save("Bars to write", str(len(self.rebar_to_write)))
 
                 # display summary tab
-                AllplanHelpers.fill_data_summary_tab(self.ctrl_prop_util, self.build_ele_list[0], None)
+                AllplanHelpers.fill_data_summary_tab(self.ctrl_prop_util, self.build_ele_list[0], self.assembly_amount_report + self.startup_timer.get_report_elements("Startup ") + self.stage_timer.get_report_elements())
+                if(self.build_ele_list[0].CheckBoxTimingTrace.value):
+                    AllplanHelpers.save_stage_trace(self.stage_timer, self.startup_timer)
                 self.set_tab_status_summary()
                 self.build_ele_list[0].text_info_user.value = "Waiting for user input"
                 return True
@@ -395,13 +552,18 @@ class BendingMachineWizardInteractor():
             export_file_numbers = [AllplanBaseElements.DrawingFileService.GetActiveFileNumber()]
 
         elif build_ele.FilesToExport.value == build_ele.IFC_EXPORT_ALL_FILES:
-            export_file_numbers = [file_index for file_index, _ in AllplanBaseElements.DrawingFileService().GetFileState()]
+            export_file_numbers = AllplanHelpers.get_loaded_drawing_file_numbers()
 
         else:
-            export_file_numbers = [int(item.FileName.split("-", 1)[0]) for item in build_ele.FileList.value if item.ExportState]
+            # files of the list that are not loaded anymore are not exported
+            drawing_file_catalogue = AllplanHelpers.get_drawing_file_catalogue()
+            export_file_numbers = [drawing_file_catalogue.get_file_number(item.FileName) for item in build_ele.FileList.value if item.ExportState]
+            export_file_numbers = [file_number for file_number in export_file_numbers if file_number is not None]
         return export_file_numbers
 
     def on_cancel_function(self):
+        # the IFC exports that did not run yet are dropped with the palette
+        self.ifc_export_queue.cancel()
         self.set_tab_status_startup()
         self.palette_service.close_palette()
         AllplanHelpers.finite_progressbar_stop()
@@ -437,12 +599,10 @@ class BendingMachineWizardInteractor():
             name:   the name of the property.
             value:  new value for property.
         """
-        # IFC Export file list generation if necessary
-        if not self.build_ele_list[0].FileList.value:
-            if (file_list_tuple := BuildingElementTupleUtil.create_namedtuple_from_definition(self.build_ele_list[0].FileList)) is not None:
-                self.build_ele_list[0].FileList.value = [  \
-                    file_list_tuple(AllplanElementAdapter.DocumentNameService.GetDocumentNameByFileNumber(index, True, False, "-"), True) \
-                    for index, _ in AllplanBaseElements.DrawingFileService().GetFileState()]
+        # IFC Export file list generation if necessary, the loaded drawing files are only read again when the list is chosen
+        if(name == "FilesToExport"):
+            AllplanHelpers.refresh_drawing_file_catalogue()
+        self.update_file_list()
 
         # update palette if necessary
         update_palette = self.palette_service.modify_element_property(page, name, value)
@@ -450,6 +610,21 @@ class BendingMachineWizardInteractor():
         if update_palette:
             self.palette_service.update_palette(-1, False)
 
+    def update_file_list(self):
+        """ The IFC export file list is only rebuilt when it is empty or the drawing file catalogue changed since its last refresh.
+            The export state of the files that stay in the list is kept, new files are exported by default.
+        """
+        build_ele = self.build_ele_list[0]
+        drawing_file_catalogue = AllplanHelpers.get_drawing_file_catalogue()
+        if build_ele.FileList.value and self.file_list_version == drawing_file_catalogue.version:
+            return
+        if (file_list_tuple := BuildingElementTupleUtil.create_namedtuple_from_definition(build_ele.FileList)) is None:
+            return
+        export_states = {drawing_file_catalogue.get_file_number(item.FileName): item.ExportState for item in build_ele.FileList.value}
+        build_ele.FileList.value = [file_list_tuple(drawing_file.name, export_states.get(drawing_file.number, True))
+                                    for drawing_file in drawing_file_catalogue.drawing_files]
+        self.file_list_version = drawing_file_catalogue.version
+
     def execute_load_favorite(self, file_name):
         """ load the favorite data """
 
@@ -512,6 +687,141 @@ class ReportElement():
         self.value = value
 
 
+class StageTimer():
+    """Wall time, item count and throughput of the stages of one run of the wizard
+    - start(stage) before and stop(items, unit) after every stage, the stages are kept in the order they ran
+    - a stage that was started but not stopped failed, it is kept in the trace without a time
+    - get_report_elements() for the summary tab, save_trace() writes the run as JSON to compare runs across machines and projects
+    """
+    def __init__(self):
+        self.started = datetime.datetime.now()
+        self.stages = []
+        self.stage_start = None
+
+    def start(self, stage: str):
+        self.stages.append({"stage": stage, "seconds": None, "items": None, "unit": None})
+        self.stage_start = time.perf_counter()
+
+    def add(self, stage: str, seconds: float):
+        """ A stage that was timed elsewhere """
+        self.stages.append({"stage": stage, "seconds": seconds, "items": None, "unit": None})
+
+    def stop(self, items: int = None, unit: str = None):
+        self.stages[-1]["seconds"] = time.perf_counter() - self.stage_start
+        self.stages[-1]["items"] = items
+        self.stages[-1]["unit"] = unit
+
+    @staticmethod
+    def get_throughput(stage):
+        if stage["items"] is None or not stage["seconds"]:
+            return None
+        return stage["items"] / stage["seconds"]
+
+    def get_total_seconds(self) -> float:
+        return sum(stage["seconds"] for stage in self.stages if stage["seconds"] is not None)
+
+    def get_report_elements(self, name_prefix: str = "Time "):
+        report_elements = []
+        for stage in self.stages:
+            if stage["seconds"] is None:
+                continue
+            value = "%.2f s" % stage["seconds"]
+            if stage["items"] is not None:
+                value = value + " - " + str(stage["items"]) + " " + stage["unit"]
+            throughput = StageTimer.get_throughput(stage)
+            if throughput is not None:
+                value = value + " (" + str(round(throughput)) + " " + stage["unit"] + "/s)"
+            report_elements.append(ReportElement(name_prefix + stage["stage"], value))
+        report_elements.append(ReportElement(name_prefix + "total", "%.2f s" % self.get_total_seconds()))
+        return report_elements
+
+    def save_trace(self, file_path, drawing_files, startup_timer: "StageTimer" = None):
+        import platform
+        trace = {"started": self.started.isoformat(timespec="seconds"),
+                 "machine": platform.node(),
+                 "python": platform.python_version(),
+                 "drawing_files": drawing_files,
+                 "total_seconds": self.get_total_seconds(),
+                 "stages": [dict(stage, throughput=StageTimer.get_throughput(stage)) for stage in self.stages]}
+        if startup_timer is not None:
+            trace["startup"] = startup_timer.stages
+        with open(file_path, "w", encoding="utf-8") as trace_file:
+            json.dump(trace, trace_file, indent=1)
+
+
+class RunProgress():
+    """Progress bar and cancellation of the stages of one event of the wizard
+    - start_stage(stage, total_items) shows a progress bar per stage, step(items) after every processed item
+    - step() is cheap, the progress bar is updated at most every UPDATE_SECONDS and every 1/STEPS of the stage
+    - the event runs synchronously, the interactor gets no events meanwhile: the cancel button of the progress bar is polled
+      when the progress bar is updated and at the start of every stage, then RunCancelledError is raised
+    - steps of a stage that must not stop halfway, e.g. writing the attributes, are not cancellable, the next stage stops
+    - the stages let RunCancelledError pass through their error handling, the interactor stops the run
+    """
+    UPDATE_SECONDS = 0.1
+    STEPS = 100 # progress bar steps per stage
+
+    def __init__(self):
+        self.is_cancelled = False
+        self.stage = None
+        self.total_items = None
+        self.done_items = 0
+        self.shown_steps = 0
+        self.update_items = 1
+        self.next_update_items = 1
+        self.last_update = 0.0
+
+    def start_stage(self, stage: str, total_items: int = None):
+        if self.stage is not None: # the progress bar of the previous stage
+            self.check_cancelled()
+        self.stage = stage
+        self.total_items = total_items
+        self.done_items = 0
+        self.shown_steps = 0
+        # without a total the time since the last update decides alone
+        self.update_items = max(1, total_items // RunProgress.STEPS) if total_items else 1
+        self.next_update_items = self.update_items
+        self.last_update = time.perf_counter()
+        AllplanHelpers.finite_progressbar_stop()
+        AllplanHelpers.finite_progressbar_create(RunProgress.STEPS, stage, "")
+
+    def step(self, items: int = 1, cancellable: bool = True):
+        self.done_items = self.done_items + items
+        if self.done_items < self.next_update_items:
+            return
+        self.next_update_items = self.done_items + self.update_items
+        now = time.perf_counter()
+        if now - self.last_update < RunProgress.UPDATE_SECONDS:
+            return
+        self.last_update = now
+        if self.total_items:
+            steps = min(RunProgress.STEPS, self.done_items * RunProgress.STEPS // self.total_items)
+            for _ in range(steps - self.shown_steps):
+                AllplanHelpers.finite_progressbar_step()
+            self.shown_steps = max(steps, self.shown_steps)
+        if cancellable:
+            self.check_cancelled()
+
+    def check_cancelled(self):
+        if not self.is_cancelled and AllplanHelpers.finite_progressbar_is_cancelled():
+            self.is_cancelled = True
+        if self.is_cancelled:
+            raise RunCancelledError(" [Exception] run cancelled during " + str(self.stage))
+
+
+# element types of the bar placements the wizard processes, as strings to compare with the type of an element
+REBAR_PLACEMENT_TYPE_UUIDS = frozenset(str(type_uuid) for type_uuid in [
+    AllplanElementAdapter.BarsLinearPlacement_TypeUUID,
+    AllplanElementAdapter.BarsLinearMultiPlacement_TypeUUID,
+    AllplanElementAdapter.BarsAreaPlacement_TypeUUID,
+    AllplanElementAdapter.BarsSpiralPlacement_TypeUUID,
+    AllplanElementAdapter.BarsCircularPlacement_TypeUUID,
+    AllplanElementAdapter.BarsRotationalSolidPlacement_TypeUUID,
+    AllplanElementAdapter.BarsRotationalPlacement_TypeUUID,
+    AllplanElementAdapter.BarsTangentionalPlacement_TypeUUID,
+    AllplanElementAdapter.BarsEndBendingPlacement_TypeUUID])
+
+
 class AllplanHelpers():
     """Contains all helper methods to run the program.
     - most helper methods are self explanatory. methods preceded with __ are internal and should not be used outside of the Allplanhelper construct
@@ -522,32 +832,44 @@ class AllplanHelpers():
     string_table = None
     first_run = True # identifier for progress bar if it needs to be created or a step needs to be set.
     progress_bar_finite = None
+    run_progress = None # RunProgress of the running event, None outside of Allplan and in the parse worker processes
+    attribute_catalogue = None # attribute definitions of the current run, see get_attribute_catalogue
+    drawing_file_catalogue = None # drawing files of the project, see get_drawing_file_catalogue
+    PARALLEL_PARSE_MIN_LINES = 20000 # below this amount of lines the BVBS file is parsed serially
+    PARALLEL_PARSE_CHUNK_LINES = 5000 # lines per task for the parse worker processes
+    PARALLEL_PARSE_CHUNKS_PER_WORKER = 2 # chunks read ahead per worker process, limits the lines in memory
+    PROFILE_ENVIRONMENT_VARIABLE = "BMWIZARD_PROFILE" # any value except "0" profiles the run, as the palette option does
+    PROFILE_TOP_FUNCTIONS = 50 # functions per sort order in the text summary of a profile
 
     @staticmethod
     def calculate_total_rebar_amounts_for_assemblies(rebar_elements, attribute_preferences):
-        set_marks = []
+        """ The total amount of an assembly mark is the sum of the amounts per assembly of all bars with that mark.
+            Bars are grouped per mark in one pass, then the totals are written back per group.
+            Returns the rebar elements and the totals per mark {mark: total amount} in order of first appearance.
+        """
+        assembly_rebar_by_mark = {}
+        amount_total_by_mark = {}
         for reb in rebar_elements:
             if reb.is_part_of_assembly:
-                set_marks.append(reb.mark.value)
-        set_marks = set(set_marks)
-        amounts = []
-        for mark in set_marks:
-            temp_amount = 0
-            for reb in rebar_elements:
-                if reb.mark.value == mark and reb.is_part_of_assembly:
-                    temp_amount = temp_amount + int(reb.amount_assembly.value)
-            for index, reb in enumerate(rebar_elements):
-                if reb.mark.value == mark and reb.is_part_of_assembly:
-                    rebar_elements[index].amount_total = RebarElementAttribute(attribute_preferences["rebaramounttotal"][0].value, str(temp_amount))
+                mark = reb.mark.value
+                assembly_rebar_by_mark.setdefault(mark, []).append(reb)
+                amount_total_by_mark[mark] = amount_total_by_mark.get(mark, 0) + int(reb.amount_assembly.value)
+        attribute_id = attribute_preferences["rebaramounttotal"][0].value
+        for mark, assembly_rebar in assembly_rebar_by_mark.items():
+            amount_total = str(amount_total_by_mark[mark])
+            for reb in assembly_rebar:
+                reb.amount_total = RebarElementAttribute(attribute_id, amount_total)
 
-        return rebar_elements
+        return rebar_elements, amount_total_by_mark
 
     @staticmethod
     def fill_data_summary_tab(ctrl_prop_util: ControlPropertiesUtil, build_ele, data_list):
+        """ data_list: optional list of ReportElements shown after the ReportHelper entries
+        """
         build_ele.AnyValueByTypeList.value = []
         value = build_ele.AnyValueByTypeList.value
         if value == []:
-            for report_element in ReportHelper.get():
+            for report_element in ReportHelper.get() + (data_list or []):
                 value.append(AnyValueByType.AnyValueByType("Text", report_element.name, report_element.value))
 
     @staticmethod
@@ -567,17 +889,37 @@ class AllplanHelpers():
     def finite_progressbar_step():
         AllplanHelpers.progress_bar_finite.Step()
 
+    @staticmethod
+    def finite_progressbar_is_cancelled() -> bool:
+        if AllplanHelpers.progress_bar_finite is None:
+            return False
+        return AllplanHelpers.progress_bar_finite.IsCancelled() is True
+
+    @staticmethod
+    def progress_stage(stage: str, total_items: int = None):
+        if AllplanHelpers.run_progress is not None:
+            AllplanHelpers.run_progress.start_stage(stage, total_items)
+
+    @staticmethod
+    def progress_step(items: int = 1, cancellable: bool = True):
+        if AllplanHelpers.run_progress is not None:
+            AllplanHelpers.run_progress.step(items, cancellable)
+
+
     @staticmethod
     def log(location: str, message, is_error_message: bool):
         if(is_error_message):
             message = AllplanHelpers.get_exception_message(message)
-        print(location + " -> " + message)
+        # the first argument of an exception is not always a text, e.g. the errno of an OSError
+        print(location + " -> " + str(message))
 
     @staticmethod
     def static_init(coord_input, string_table: BuildingElementStringTable):
         AllplanHelpers.coord_input = coord_input
         AllplanHelpers.string_table = string_table
         AllplanHelpers.doc = coord_input.GetInputViewDocument()
+        AllplanHelpers.attribute_catalogue = None
+        AllplanHelpers.drawing_file_catalogue = None
 
     @staticmethod
     def show_message_in_taskbar(message: str):
@@ -607,17 +949,17 @@ class AllplanHelpers():
             return False
 
     @staticmethod
-    def import_bending_machine_files(file_path:str) -> tuple[bool, List[str]]:
-        temporary_list = None
+    def import_bending_machine_files(file_path:str, encoding: str = "cp1252") -> tuple[bool, BVBSFileReader]:
+        """ The lines are not read here, the returned reader streams them to the parse stage one by one.
+        """
         try:
-            file = open(file_path, "r")
-            temporary_list = file.readlines()
-            file.close()
-            ReportHelper.save("BVBS definition entries", str(len(temporary_list)))
-            return True, temporary_list
+            if(not Path(file_path).is_file()):
+                raise Exception(" [Exception] BVBS file not found: " + file_path)
+            codecs.lookup(encoding) # fail early on an unknown encoding
+            return True, BVBSFileReader(file_path, encoding)
         except Exception as exc:
             print(AllplanHelpers.get_exception_message(exc))
-            return False, temporary_list
+            return False, None
 
     @staticmethod
     def select_drawing_elements():
@@ -629,13 +971,18 @@ class AllplanHelpers():
 
     @staticmethod
     def get_assembly_information_from_selection(selection_elementadapterlist: AllplanElementAdapter):
+        """ Returns the AssemblyElements for the report and a reverse index UUID of a placement -> assembly name.
+            The UUID is used as a string in the index, when a placement is in more than one assembly the first one is kept.
+        """
         assembly_selection = []
         for element in selection_elementadapterlist:
             if element.GetDisplayName() == "Assembly":
                 assembly_selection.append(element)
         # elements have been selected now get the assembly name attribute
         assembly_matching_table = []
+        assembly_name_by_uuid = {}
         for assembly in assembly_selection:
+            AllplanHelpers.progress_step()
             uuids = []
             attributes = assembly.GetAttributes(AllplanBaseElements.eAttibuteReadState.ReadAllAndComputable)
             assembly_name = AllplanHelpers.linear_search(attributes, 507)
@@ -646,30 +993,33 @@ class AllplanHelpers():
                 uuid = AllplanHelpers.__get_placement_uuid(placement)
                 if uuid:
                     uuids.append(uuid)
+                    assembly_name_by_uuid.setdefault(str(uuid), assembly_name)
             assembly_matching_table.append(AssemblyElement(assembly_name, uuids))
         ReportHelper.save("Assemblies in drawing", str(len(assembly_matching_table)))
-        return assembly_matching_table
+        return assembly_matching_table, assembly_name_by_uuid
 
     @staticmethod
     def filter_drawing_elements_for_rebar(selection_elementadapterlist: AllplanElementAdapter):
+        """ Cheap checks first: the element type is compared with the bar placement types before reading any attributes,
+            only the remaining placements have their attributes read to check the IFC class.
+        """
         rebar_selection = []
-        placement_uuids = [AllplanElementAdapter.BarsLinearPlacement_TypeUUID,
-                           AllplanElementAdapter.BarsLinearMultiPlacement_TypeUUID,
-                           AllplanElementAdapter.BarsAreaPlacement_TypeUUID,
-                           AllplanElementAdapter.BarsSpiralPlacement_TypeUUID,
-                           AllplanElementAdapter.BarsCircularPlacement_TypeUUID,
-                           AllplanElementAdapter.BarsRotationalSolidPlacement_TypeUUID,
-                           AllplanElementAdapter.BarsRotationalPlacement_TypeUUID,
-                           AllplanElementAdapter.BarsTangentionalPlacement_TypeUUID,
-                           AllplanElementAdapter.BarsEndBendingPlacement_TypeUUID]
+        rejected_by_placement_type = 0
+        rejected_by_ifc_class = 0
         # first get the rebar and save it to a smaller list to work with
         for element in selection_elementadapterlist:
+            AllplanHelpers.progress_step()
+            if str(element.GetElementAdapterType().GetGuid()) not in REBAR_PLACEMENT_TYPE_UUIDS:
+                rejected_by_placement_type = rejected_by_placement_type + 1
+                continue
             attributes = element.GetAttributes(AllplanBaseElements.eAttibuteReadState.ReadAllAndComputable)
             ifc_class = AllplanHelpers.linear_search(attributes, 684)
-            if(not ifc_class == None):
-                ifc_class = ifc_class[1]
-                if(ifc_class == "IfcReinforcingBar" and element.GetElementAdapterType().GetGuid() in placement_uuids):
-                    rebar_selection.append(element)
+            if(ifc_class == None or not ifc_class[1] == "IfcReinforcingBar"):
+                rejected_by_ifc_class = rejected_by_ifc_class + 1
+                continue
+            rebar_selection.append(element)
+        ReportHelper.save("Rejected elements: no bar placement", str(rejected_by_placement_type))
+        ReportHelper.save("Rejected placements: no IfcReinforcingBar", str(rejected_by_ifc_class))
         if(len(rebar_selection) == 0):
             return False, None
         else:
@@ -702,17 +1052,258 @@ class AllplanHelpers():
         return None
 
     @staticmethod
-    def create_rebar_from_bending_machine_files(bvbs_data_lines: List[str], attribute_preferences):
-        created_rebar = []
-        for data_line in bvbs_data_lines:
-            rebar = RebarElement()
-            try:
-                rebar.init_from_bvbs(data_line, attribute_preferences)
-                created_rebar.append(rebar)
-            except Exception as exc:
-                AllplanHelpers.log("create_rebar_from_bvbs", exc , True)
-                return False, exc
+    def parse_bvbs_lines(bvbs_data_lines: Iterable[str], attribute_preferences, first_line_number: int = 1,
+                         pipeline: "RebarPipeline" = None) -> tuple[RebarTable, int]:
+        """ Parses the lines on this thread with progress, see bvbs_parser.parse_bvbs_lines """
+        return BVBSParser.parse_bvbs_lines(bvbs_data_lines, attribute_preferences, first_line_number, AllplanHelpers.progress_step, pipeline)
+
+    @staticmethod
+    def get_parse_python_executable():
+        """ The Python interpreter for the parse worker processes, None if there is none.
+        Inside Allplan sys.executable is Allplan.exe, the workers are started with the python.exe Allplan ships with.
+        """
+        if Path(sys.executable).stem.lower().startswith("python"):
+            return sys.executable
+        for prefix in (sys.exec_prefix, sys.base_exec_prefix):
+            for python_executable in (Path(prefix) / "python.exe", Path(prefix) / "bin" / "python3"):
+                if python_executable.is_file():
+                    return str(python_executable)
+        return None
+
+    @staticmethod
+    def parse_bvbs_lines_parallel(bvbs_data_lines: Iterable[str], attribute_preferences, first_line_number: int = 1,
+                                  pipeline: "RebarPipeline" = None) -> tuple[RebarTable, int]:
+        """ Parses chunks of lines in a process pool, the tables of the chunks are merged in the original line order.
+        The chunks are read from the lines while the workers parse, at most PARALLEL_PARSE_CHUNKS_PER_WORKER chunks per worker
+        are read ahead. Small files are parsed serially, starting the worker processes takes longer than parsing them.
+        The pipeline gets every chunk as soon as it is merged, while the workers parse the next chunks.
+        """
+        bvbs_data_lines = iter(bvbs_data_lines)
+        first_lines = list(islice(bvbs_data_lines, AllplanHelpers.PARALLEL_PARSE_MIN_LINES))
+        python_executable = AllplanHelpers.get_parse_python_executable()
+        if len(first_lines) < AllplanHelpers.PARALLEL_PARSE_MIN_LINES or python_executable is None:
+            return AllplanHelpers.parse_bvbs_lines(chain(first_lines, bvbs_data_lines), attribute_preferences, first_line_number, pipeline)
+        import multiprocessing
+        from collections import deque
+        from concurrent.futures import ProcessPoolExecutor
+        from concurrent.futures.process import BrokenProcessPool
+        # the workers are new interpreters, they only import bvbs_parser, palette parameters can not be sent to them
+        worker_preferences = {key: [AttributePreference(preference[0].value)] for key, preference in attribute_preferences.items()}
+        chunk_size = AllplanHelpers.PARALLEL_PARSE_CHUNK_LINES
+        chunks = chain((first_lines[start:start + chunk_size] for start in range(0, len(first_lines), chunk_size)),
+                       iter(lambda: list(islice(bvbs_data_lines, chunk_size)), []))
+        mp_context = multiprocessing.get_context("spawn")
+        mp_context.set_executable(python_executable)
+        worker_count = os.cpu_count() or 1
+        rebar_table = RebarTable()
+        line_count = 0
+        pending_chunks = deque() # (first line number, lines, future), in line order
+        submitted_chunk = None # (first line number, lines) of the chunk that is being submitted, it is not pending if submit fails
+        try:
+            with ProcessPoolExecutor(max_workers=worker_count, mp_context=mp_context) as executor:
+                try:
+                    next_line_number = first_line_number
+                    for chunk in chunks:
+                        submitted_chunk = (next_line_number, chunk)
+                        pending_chunks.append((next_line_number, chunk, executor.submit(BVBSParser.parse_bvbs_lines, chunk, worker_preferences, next_line_number)))
+                        submitted_chunk = None
+                        next_line_number = next_line_number + len(chunk)
+                        # the first chunk that failed raises the first error of the file
+                        while pending_chunks and (len(pending_chunks) >= worker_count * AllplanHelpers.PARALLEL_PARSE_CHUNKS_PER_WORKER or pending_chunks[0][2].done()):
+                            line_count = line_count + AllplanHelpers.__merge_parsed_chunk(rebar_table, pending_chunks[0][2].result(), pipeline)
+                            pending_chunks.popleft()
+                    while pending_chunks:
+                        line_count = line_count + AllplanHelpers.__merge_parsed_chunk(rebar_table, pending_chunks[0][2].result(), pipeline)
+                        pending_chunks.popleft()
+                except RunCancelledError:
+                    # chunks that did not start are dropped, only the running ones are waited for
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    raise
+        except (BrokenProcessPool, OSError) as exc:
+            # the worker processes could not be started (or could not import the parser), the chunks that are not merged yet,
+            # the chunk whose submit failed and the chunks that are not read yet are parsed on this thread instead
+            AllplanHelpers.log("parse_bvbs_lines_parallel", "process pool not available, parsing serially: " + str(exc), False)
+            unmerged_chunks = [(chunk_line_number, chunk) for chunk_line_number, chunk, _ in pending_chunks]
+            if submitted_chunk is not None:
+                unmerged_chunks.append(submitted_chunk)
+            read_line_count = unmerged_chunks[-1][0] + len(unmerged_chunks[-1][1]) - first_line_number if unmerged_chunks else line_count
+            for chunk_line_number, chunk in unmerged_chunks:
+                chunk_table, chunk_line_count = BVBSParser.parse_bvbs_lines(chunk, attribute_preferences, chunk_line_number)
+                line_count = line_count + AllplanHelpers.__merge_parsed_chunk(rebar_table, (chunk_table, chunk_line_count), pipeline)
+            remaining_table, remaining_line_count = BVBSParser.parse_bvbs_lines(chain.from_iterable(chunks), attribute_preferences, first_line_number + line_count,
+                                                                                AllplanHelpers.progress_step)
+            line_count = line_count + AllplanHelpers.__merge_parsed_chunk(rebar_table, (remaining_table, 0), pipeline) + remaining_line_count
+            # every line is one bar, a chunk that was lost on the way would show here
+            read_line_count = read_line_count + remaining_line_count
+            if rebar_table.row_count != read_line_count or line_count != read_line_count:
+                raise Exception(" [Exception] parallel parse lost lines: " + str(rebar_table.row_count) + " bars for " + str(read_line_count) + " lines")
+        return rebar_table, line_count
+
+    @staticmethod
+    def __merge_parsed_chunk(rebar_table: RebarTable, parsed_chunk, pipeline: "RebarPipeline") -> int:
+        """ Appends the table of a parsed chunk, returns the amount of lines of the chunk """
+        chunk_table, chunk_line_count = parsed_chunk
+        first_row = rebar_table.row_count
+        rebar_table.extend(chunk_table)
+        AllplanHelpers.progress_step(chunk_line_count)
+        if pipeline is not None:
+            pipeline.add_rows(rebar_table, first_row, rebar_table.row_count)
+        return chunk_line_count
+
+    @staticmethod
+    def parse_bvbs_lines_incremental(bvbs_data_lines: Iterable[str], attribute_preferences, snapshot: "ParseSnapshot", parallel: bool = False,
+                                     pipeline: "RebarPipeline" = None) -> tuple["RebarTable", int]:
+        """ Only lines that are not in the previous snapshot are parsed, in runs of consecutive lines so errors keep their line number.
+        The lines and parsed rows of this run are stored in the snapshot. The pipeline changes the rows, so it only gets them
+        once they are copied into the snapshot, after the last line.
+        """
+        bvbs_data_lines = list(bvbs_data_lines)
+        snapshot.line_keys = ParseSnapshot.get_line_keys(bvbs_data_lines)
+        previous_rows = {line_key: row for row, line_key in enumerate(snapshot.previous_line_keys)}
+
+        # consecutive lines that are reused or parsed: [is reused, first line, last line + 1]
+        line_runs = []
+        for line_number, line_key in enumerate(snapshot.line_keys):
+            is_reused = line_key in previous_rows
+            if line_runs and line_runs[-1][0] == is_reused:
+                line_runs[-1][2] = line_number + 1
+            else:
+                line_runs.append([is_reused, line_number, line_number + 1])
+
+        rebar_table = RebarTable()
+        parsed_rows = []
+        for is_reused, first_line, end_line in line_runs:
+            if is_reused:
+                rebar_table.extend(snapshot.previous_rebar_table, [previous_rows[line_key] for line_key in snapshot.line_keys[first_line:end_line]])
+                AllplanHelpers.progress_step(end_line - first_line)
+                continue
+            if(parallel):
+                run_table, _ = AllplanHelpers.parse_bvbs_lines_parallel(bvbs_data_lines[first_line:end_line], attribute_preferences, first_line + 1)
+            else:
+                run_table, _ = AllplanHelpers.parse_bvbs_lines(bvbs_data_lines[first_line:end_line], attribute_preferences, first_line + 1)
+            parsed_rows.extend(range(rebar_table.row_count, rebar_table.row_count + run_table.row_count))
+            rebar_table.extend(run_table)
+
+        # a parsed bar with the mark and assembly of a bar that is not in this export anymore was changed, otherwise it was added
+        line_keys = set(snapshot.line_keys)
+        previous_identities = {}
+        for line_key, row in previous_rows.items():
+            if line_key not in line_keys:
+                identity = ParseSnapshot.get_rebar_identity(RebarTableRow(snapshot.previous_rebar_table, row))
+                previous_identities[identity] = previous_identities.get(identity, 0) + 1
+        changed_amount = 0
+        for row in parsed_rows:
+            identity = ParseSnapshot.get_rebar_identity(RebarTableRow(rebar_table, row))
+            if previous_identities.get(identity, 0) > 0:
+                previous_identities[identity] = previous_identities[identity] - 1
+                changed_amount = changed_amount + 1
+        ReportHelper.save("Reused bars", str(rebar_table.row_count - len(parsed_rows)))
+        ReportHelper.save("Changed bars", str(changed_amount))
+        ReportHelper.save("Added bars", str(len(parsed_rows) - changed_amount))
+        ReportHelper.save("Removed bars", str(sum(previous_identities.values())))
+
+        # the later stages change the rows, the snapshot keeps a copy of the rows as parsed
+        snapshot.rebar_table = RebarTable()
+        snapshot.rebar_table.extend(rebar_table)
+        if pipeline is not None:
+            pipeline.add_rows(rebar_table, 0, rebar_table.row_count)
+        return rebar_table, len(bvbs_data_lines)
+
+    @staticmethod
+    def get_drawing_file_catalogue() -> "DrawingFileCatalogue":
+        """ The catalogue is kept while the wizard is open, it is only read from Allplan when it is created and refreshed.
+            Property changes use it as it is, the file state is not read on every change.
+        """
+        if AllplanHelpers.drawing_file_catalogue is None:
+            AllplanHelpers.refresh_drawing_file_catalogue()
+        return AllplanHelpers.drawing_file_catalogue
+
+    @staticmethod
+    def refresh_drawing_file_catalogue() -> bool:
+        """ Reads the file state of the project, called on every button click. Returns True if the drawing files changed """
+        if AllplanHelpers.drawing_file_catalogue is None:
+            AllplanHelpers.drawing_file_catalogue = DrawingFileCatalogue()
+        return AllplanHelpers.drawing_file_catalogue.refresh()
+
+    @staticmethod
+    def get_loaded_drawing_file_numbers():
+        return [drawing_file.number for drawing_file in AllplanHelpers.get_drawing_file_catalogue().drawing_files]
+
+    @staticmethod
+    def get_bvbs_temp_path() -> str:
+        return AllplanSettings.AllplanPaths.GetUsrPath() + "tmp\\bendtemp.bvbs"
+
+    @staticmethod
+    def get_parse_snapshot_key(bvbs_file_path: str) -> tuple:
+        # one snapshot per document: the same drawing file numbers in another project are another document,
+        # the BVBS export covers all loaded drawing files
+        file_numbers = tuple(AllplanHelpers.get_loaded_drawing_file_numbers())
+        return (os.path.normcase(AllplanSettings.AllplanPaths.GetCurPrjPath()), os.path.normcase(bvbs_file_path), file_numbers)
+
+    @staticmethod
+    def get_parse_snapshot_path(snapshot_key: tuple) -> str:
+        import hashlib
+        key_hash = hashlib.blake2b(repr(snapshot_key).encode("utf-8"), digest_size=8).hexdigest()
+        return AllplanSettings.AllplanPaths.GetUsrPath() + "tmp\\bendtemp_" + key_hash + ".snapshot"
+
+    @staticmethod
+    def save_stage_trace(stage_timer: StageTimer, startup_timer: StageTimer = None):
+        """ Writes the timing trace of the run next to the BVBS temp file, one file per run """
+        trace_path = AllplanSettings.AllplanPaths.GetUsrPath() + "tmp\\bendtemp_trace_" + stage_timer.started.strftime("%Y%m%d_%H%M%S") + ".json"
+        try:
+            stage_timer.save_trace(trace_path, AllplanHelpers.get_loaded_drawing_file_numbers(), startup_timer)
+        except Exception as exc:
+            AllplanHelpers.log("save_stage_trace", str(exc), False)
+
+    @staticmethod
+    def is_profiling_enabled(build_ele: BuildingElement) -> bool:
+        return build_ele.CheckBoxProfiling.value or os.environ.get(AllplanHelpers.PROFILE_ENVIRONMENT_VARIABLE, "0") not in ("", "0")
+
+    @staticmethod
+    def get_profile_path() -> str:
+        """ Without extension, the profile is saved as .pstats and as a text summary .txt next to the BVBS temp file """
+        return AllplanSettings.AllplanPaths.GetUsrPath() + "tmp\\bendtemp_profile_" + datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    @staticmethod
+    def save_profile(profiler: "cProfile.Profile", profile_path: str):
+        """ The .pstats file can be opened with pstats or snakeviz, the text summary lists the most expensive functions
+            by cumulative and by own time. Worker processes of the parallel parse are not part of the profile.
+        """
+        import pstats
+        try:
+            profiler.dump_stats(profile_path + ".pstats")
+            with open(profile_path + ".txt", "w", encoding="utf-8") as summary_file:
+                stats = pstats.Stats(profiler, stream=summary_file)
+                stats.strip_dirs()
+                stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(AllplanHelpers.PROFILE_TOP_FUNCTIONS)
+                stats.sort_stats(pstats.SortKey.TIME).print_stats(AllplanHelpers.PROFILE_TOP_FUNCTIONS)
+        except Exception as exc:
+            AllplanHelpers.log("save_profile", str(exc), False)
+
+    @staticmethod
+    def create_rebar_from_bending_machine_files(bvbs_data_lines: Iterable[str], attribute_preferences, parallel: bool = False, snapshot: "ParseSnapshot" = None,
+                                                pipeline: "RebarPipeline" = None):
+        """ With a snapshot the lines are parsed incrementally, see parse_bvbs_lines_incremental.
+        With a pipeline the bars go through the next stages while the lines are parsed, see RebarPipeline.
+        """
+        try:
+            if(snapshot is not None):
+                rebar_table, line_count = AllplanHelpers.parse_bvbs_lines_incremental(bvbs_data_lines, attribute_preferences, snapshot, parallel, pipeline)
+            elif(parallel):
+                rebar_table, line_count = AllplanHelpers.parse_bvbs_lines_parallel(bvbs_data_lines, attribute_preferences, 1, pipeline)
+            else:
+                rebar_table, line_count = AllplanHelpers.parse_bvbs_lines(bvbs_data_lines, attribute_preferences, 1, pipeline)
+            created_rebar = rebar_table.rows() if pipeline is None else pipeline.rebar_elements
+        except RunCancelledError:
+            raise
+        except Exception as exc:
+            AllplanHelpers.log("create_rebar_from_bvbs", exc , True)
+            return False, exc
+        # the attributes are only created in Allplan once all lines are parsed
+        if pipeline is not None:
+            pipeline.create_segment_attributes()
         # for the user, give some more information in the report
+        ReportHelper.save("BVBS definition entries", str(line_count))
         bf2d_amount = 0
         bf3d_amount = 0
         for reb in created_rebar:
@@ -773,6 +1364,12 @@ class AllplanHelpers():
                                                       attributeListValues=      attr_list_values)
         return attribute_number
 
+    @staticmethod
+    def get_attribute_catalogue():
+        if AllplanHelpers.attribute_catalogue is None:
+            AllplanHelpers.attribute_catalogue = AttributeCatalogue()
+        return AllplanHelpers.attribute_catalogue
+
     @staticmethod
     def get_attribute_type_for_attribute_id(id):
         return AllplanBaseElements.AttributeService.GetAttributeType(AllplanHelpers.doc, id)
@@ -786,48 +1383,41 @@ class AllplanHelpers():
             return alfa[index].upper()
 
     @staticmethod
-    def set_create_segment_angles_lengths_attributes(rebar_elements, attribute_preferences):
-        """ Create only new length and angle attributes where necessary. Other attributes are defined in the palette by the user.
-            This will only process lengths and angles if the allplan_attribute_id of the segment attributes has been set to "undefined".
-            Other accepted values are "placeholder" and will result in the attribute creation being skipped as well as a shift in the sequential letter order.
-        Args:
-            rebar_elements:        a list of Elements of type RebarElements
-            attribute_preferences: the attribute preferences defined by the user in the palette.
+    def get_segment_attribute_names(rebar_elements, attribute_preferences, attribute_type = None):
+        """ Name the segment attributes of every bar: prefix + letter of the segment, no Allplan API is used.
+        Returns:
+            {attribute name: (attribute type, attribute dimension)} of the distinct names, and (length names, angle names, bend names) per bar
         """
         prefix_length = attribute_preferences["rebarlengthx"][0].value
         prefix_angle = attribute_preferences["rebaranglex"][0].value
         prefix_bend = attribute_preferences["rebarbendx"][0].value
         # this assumes the sequential order of lengths (A,C,E...) and angles (B,D,F...) in the lists. If this is not the case, wrong attribute names may be generated.
-        # attribute
-        try:
-            for index, ele in enumerate(rebar_elements):
-                new_lengths = []
-                new_angles = []
-                new_bendingpins = []
-                lengths = ele.segment_lengths
-                angles = ele.segment_angles
-                bendingpins = ele.segment_angles_bendingpins
-
-                for len in lengths:
-                        atttribute_id = AllplanHelpers.create_new_attribute_in_allplan(prefix_length + AllplanHelpers.__alphabet(len.allplan_attribute_id), AllplanBaseElements.AttributeService.AttributeType.Double,"mm")
-                        new_lengths.append(RebarElementAttribute(atttribute_id, len.value))
-
-
-                for ang in angles:
-                        atttribute_id = AllplanHelpers.create_new_attribute_in_allplan(prefix_angle + AllplanHelpers.__alphabet(ang.allplan_attribute_id), AllplanBaseElements.AttributeService.AttributeType.Double,"deg")
-                        new_angles.append(RebarElementAttribute(atttribute_id, ang.value))
-
-                for bend in bendingpins:
-                        atttribute_id = AllplanHelpers.create_new_attribute_in_allplan(prefix_bend + AllplanHelpers.__alphabet(bend.allplan_attribute_id), AllplanBaseElements.AttributeService.AttributeType.Double,"mm")
-                        if bend.value: # this is none for all skipped bends, so that letters continue.
-                            new_bendingpins.append(RebarElementAttribute(atttribute_id, bend.value))
-
-                rebar_elements[index].segment_lengths = new_lengths
-                rebar_elements[index].segment_angles = new_angles
-                rebar_elements[index].segment_angles_bendingpins = new_bendingpins
-            return True, rebar_elements
-        except:
-            return False, None
+        attribute_definitions = {}
+        segment_attribute_names = []
+        for ele in rebar_elements:
+            length_names = [prefix_length + AllplanHelpers.__alphabet(length.allplan_attribute_id) for length in ele.segment_lengths]
+            angle_names = [prefix_angle + AllplanHelpers.__alphabet(ang.allplan_attribute_id) for ang in ele.segment_angles]
+            bend_names = [prefix_bend + AllplanHelpers.__alphabet(bend.allplan_attribute_id) for bend in ele.segment_angles_bendingpins]
+            for attribute_name in length_names:
+                attribute_definitions.setdefault(attribute_name, (attribute_type, "mm"))
+            for attribute_name in angle_names:
+                attribute_definitions.setdefault(attribute_name, (attribute_type, "deg"))
+            for attribute_name in bend_names:
+                attribute_definitions.setdefault(attribute_name, (attribute_type, "mm"))
+            segment_attribute_names.append((length_names, angle_names, bend_names))
+        return attribute_definitions, segment_attribute_names
+
+    @staticmethod
+    def set_segment_attribute_ids(rebar_elements, segment_attribute_names, attribute_ids):
+        """ Assign the attribute IDs {attribute name: attribute ID} to the segments named by get_segment_attribute_names """
+        for ele, (length_names, angle_names, bend_names) in zip(rebar_elements, segment_attribute_names):
+            ele.segment_lengths = [RebarElementAttribute(attribute_ids[attribute_name], length.value)
+                                   for attribute_name, length in zip(length_names, ele.segment_lengths)]
+            ele.segment_angles = [RebarElementAttribute(attribute_ids[attribute_name], ang.value)
+                                  for attribute_name, ang in zip(angle_names, ele.segment_angles)]
+            ele.segment_angles_bendingpins = [RebarElementAttribute(attribute_ids[attribute_name], bend.value)
+                                              for attribute_name, bend in zip(bend_names, ele.segment_angles_bendingpins)
+                                              if bend.value] # this is none for all skipped bends, so that letters continue.
 
     @staticmethod
     def __get_rebar_mark_for_placement(element, only_global_position):
@@ -845,12 +1435,8 @@ class AllplanHelpers():
         return element.GetElementAdapterType().GetGuid()
 
     @staticmethod
-    def __get_assembly_id_for_placement(mark, assembly_match_table):
-        for assembly_element in assembly_match_table:
-            for ass_mark in assembly_element.rebar_uuids:
-                if ass_mark == mark:
-                    return assembly_element.assembly_name
-        return None
+    def __get_assembly_id_for_placement(uuid, assembly_name_by_uuid):
+        return assembly_name_by_uuid.get(str(uuid))
 
     @staticmethod
     def __get_placement_uuid(element):
@@ -858,57 +1444,54 @@ class AllplanHelpers():
 
     @staticmethod
     def adjust_rebar_lengths_for_bars_with_couplers(rebar_elements):
+        # pre-pass: the fixture length of every coupler type and diameter is read once, before the segments are adjusted
+        coupler_fixtures = CouplerFixtureCatalogue()
+        fixture_lengths = coupler_fixtures.get_fixture_lengths(rebar_elements)
+        ReportHelper.save("Coupler fixtures read", str(coupler_fixtures.fixture_reads))
         success = True
-        for rebar_element in rebar_elements:
-            success = rebar_element.adjust_first_last_segment_when_coupler()
+        for rebar_element, fixture_length in zip(rebar_elements, fixture_lengths):
+            AllplanHelpers.progress_step()
+            success = rebar_element.adjust_first_last_segment_when_coupler(fixture_length) if fixture_length is not None else False
         return success
 
     @staticmethod
-    def set_corresponding_elements_on_rebarelements(rebar_elements, allplan_selection, assembly_match_table):
+    def get_polygonal_placements_not_unlinked(polygonal_placement_marks):
+        """ Group the marks of "Place in polygon" placements by global position number (the part before the ".").
+            A global position with one single distinct mark has not been unlinked, its mark "<global position>.1" is returned in a set.
+        Args:
+            polygonal_placement_marks: the marks as strings, "<global position>.<subposition>" or "<global position>"
+        """
+        marks_by_global_mark = {}
+        for placement_mark in polygonal_placement_marks:
+            marks_by_global_mark.setdefault(placement_mark.split(".")[0], set()).add(placement_mark)
+        return {global_mark + ".1" for global_mark, placement_marks in marks_by_global_mark.items() if len(placement_marks) == 1}
+
+    @staticmethod
+    def set_corresponding_elements_on_rebarelements(rebar_elements, allplan_selection, assembly_name_by_uuid, rebar_index: "RebarMarkIndex" = None):
         # check place in polygon rebar that only contains one element, this would mean the rebar has not been unlinked
         # BUG: check will fail under the following conditions:
         # two placements, same mark number, one unlinked, one not. There is no possible way to figure out which was was unlinked, which one was not.
-        polygonal_placements_not_unlinked_temp_list = []
-        polygonal_placements_not_unlinked_global_marks_temp_list = []
-        polygonal_placements_not_unlinked_list = []
-        for allplan_rebar in allplan_selection:
-            allplan_placement = allplan_rebar.GetElementAdapterType().DisplayName
-            if allplan_placement == "Place in polygon":
-                allplan_mark = str(AllplanHelpers.__get_rebar_mark_for_placement(allplan_rebar, False))
-                polygonal_placements_not_unlinked_temp_list.append(allplan_mark)
-                polygonal_placements_not_unlinked_global_marks_temp_list.append(allplan_mark.split(".")[0])
-        for placement_global_mark in polygonal_placements_not_unlinked_global_marks_temp_list:
-            times_placement_found = []
-            for placement_mark in polygonal_placements_not_unlinked_temp_list:
-                if placement_mark.startswith(placement_global_mark):
-                    times_placement_found.append(placement_mark)
-            times_placement_found = list(set(times_placement_found))
-            if len(times_placement_found) == 1:
-                polygonal_placements_not_unlinked_list.append(placement_global_mark + ".1")
+        allplan_marks = [AllplanHelpers.__get_rebar_mark_for_placement(allplan_rebar, False) for allplan_rebar in allplan_selection]
+        polygonal_placements_not_unlinked = AllplanHelpers.get_polygonal_placements_not_unlinked(
+            str(allplan_mark) for allplan_rebar, allplan_mark in zip(allplan_selection, allplan_marks)
+            if allplan_rebar.GetElementAdapterType().DisplayName == "Place in polygon")
 
         unassigned_allplan_marks = []
-        for allplan_rebar in allplan_selection:
-            allplan_mark = AllplanHelpers.__get_rebar_mark_for_placement(allplan_rebar, False)
+        if rebar_index is None:
+            rebar_index = RebarMarkIndex(rebar_elements)
+        for allplan_rebar, allplan_mark in zip(allplan_selection, allplan_marks):
+            AllplanHelpers.progress_step()
             allplan_uid = AllplanHelpers.__get_placement_uuid(allplan_rebar)
-            assembly_id = AllplanHelpers.__get_assembly_id_for_placement(allplan_uid, assembly_match_table)
+            assembly_id = AllplanHelpers.__get_assembly_id_for_placement(allplan_uid, assembly_name_by_uuid)
             match_is_found = False
             # test for unlinked placements, if not unlinked, then make it fail
-            if str(allplan_mark) in polygonal_placements_not_unlinked_list:
+            if str(allplan_mark) in polygonal_placements_not_unlinked:
                 allplan_mark = AllplanHelpers.__get_rebar_mark_for_placement(allplan_rebar, True)
-            # iteration for all placements dependent on if assembly has been found or not.
-            if not assembly_id:
-                for index, rebar_element in enumerate(rebar_elements):
-                    if str(rebar_element.mark.value) == str(allplan_mark):
-                        AllplanHelpers.__set_corresponding_element_on_rebarelement(rebar_elements[index], allplan_rebar)
-                        match_is_found = True
-                        break
-            else:
-                for index, rebar_element in enumerate(rebar_elements):
-                    if rebar_element.assembly:
-                        if str(rebar_element.mark.value) == str(allplan_mark) and str(assembly_id) == str(rebar_element.assembly.value):
-                            AllplanHelpers.__set_corresponding_element_on_rebarelement(rebar_elements[index], allplan_rebar)
-                            match_is_found = True
-                            break
+            # lookup dependent on if assembly has been found or not.
+            rebar_element = rebar_index.find(allplan_mark, assembly_id)
+            if rebar_element:
+                AllplanHelpers.__set_corresponding_element_on_rebarelement(rebar_element, allplan_rebar)
+                match_is_found = True
 
             # no match is found, we should add unassigned elements to a set.
             if not match_is_found:
@@ -920,442 +1503,540 @@ class AllplanHelpers():
 
     @staticmethod
     def __set_corresponding_element_on_rebarelement(rebar_element, allplan_selected_element):
-        rebar_element.allplan_elements.append(allplan_selected_element)
+        rebar_element.add_allplan_element(allplan_selected_element)
         allplan_placement_type = AllplanHelpers.__get_placement_type_for_placement(allplan_selected_element)
         rebar_element.allplan_placement_type = allplan_placement_type
 
     @staticmethod
-    def write_attributes_to_allplan(rebar_elements, create_timestamp_attribute):
-        current_attribute = "Current Attribute: None"
+    def write_attributes_to_allplan(rebar_elements, create_timestamp_attribute, delta_write: bool = False):
+        """ With delta_write, the current attributes of every Allplan element are read first and only the attributes
+        that differ after the type and unit conversion are written. The timestamp is only added to elements that get other changes.
+        """
+        current_attribute = None
         try:
+            # the types of all attribute IDs are read from Allplan once, before writing
+            attribute_converters = AllplanHelpers.get_attribute_catalogue().get_attribute_converters(
+                {int(attribute.allplan_attribute_id) for rebar_element in rebar_elements for attribute in rebar_element.get_attributes_as_list() if attribute})
+            timestamp = str(datetime.datetime.now().strftime("%Y-%m-%d %H:%M"))
+            write_plan = AttributeWritePlan()
+            skipped_writes = 0
+            attribute_reads = 0
+
             for rebar_element in rebar_elements:
-                    AllplanHelpers.finite_progressbar_step()
-                    attributes = BuildingElementAttributeList()
+                    AllplanHelpers.progress_step()
+                    converted_attributes = []
 
                     for attribute in rebar_element.get_attributes_as_list():
                         if not attribute:
                             continue
-                        current_attribute = "Current Attribute: attribute id: " + str(attribute.allplan_attribute_id) + " & value: " + str(attribute.value)
+                        current_attribute = attribute
+                        attribute_id = int(attribute.allplan_attribute_id)
+                        attribute_converter = attribute_converters[attribute_id]
+                        if attribute_converter:
+                            converted_attributes.append((attribute_id, attribute_converter, attribute_converter(attribute.value)))
+                    current_attribute = None
+
+                    if(not delta_write):
+                        write_plan.add(AllplanHelpers.__get_attribute_tuples(converted_attributes, create_timestamp_attribute, timestamp), rebar_element.allplan_elements)
+                        continue
+
+                    # the values are compared as they are written, after add_attribute_by_unit converted them to the unit of the attribute
+                    unit_attribute_tuples = AllplanHelpers.__get_unit_attribute_tuples(converted_attributes)
+                    # every element can hold other values, the attributes to write are decided per element
+                    for allplan_element in rebar_element.allplan_elements:
+                        current_values = dict(allplan_element.GetAttributes(AllplanBaseElements.eAttibuteReadState.ReadAll))
+                        attribute_reads = attribute_reads + 1
+                        changed_attributes = [(attribute_id, value) for attribute_id, value in unit_attribute_tuples
+                                              if not AllplanHelpers.__is_attribute_value_equal(attribute_converters.get(attribute_id), current_values.get(attribute_id), value)]
+                        skipped_writes = skipped_writes + len(unit_attribute_tuples) - len(changed_attributes)
+                        if changed_attributes:
+                            if(create_timestamp_attribute):
+                                changed_attributes.extend(AllplanHelpers.__get_timestamp_attribute_tuples(timestamp))
+                            write_plan.add(changed_attributes, [allplan_element])
+
+            # nothing has been written so far, the run can only be cancelled up to here, the attributes are written completely
+            AllplanHelpers.progress_stage("writing attributes", len(write_plan.elements_by_attributes))
+            write_calls = write_plan.write()
+            ReportHelper.save("Attribute write calls (ChangeAttributes)", str(write_calls))
+            if(delta_write):
+                ReportHelper.save("Skipped attribute writes (unchanged)", str(skipped_writes))
+                ReportHelper.save("Extra attribute reads (GetAttributes)", str(attribute_reads))
+            return True, None
+        except RunCancelledError:
+            raise
+        except:
+            if current_attribute:
+                return False, "Current Attribute: attribute id: " + str(current_attribute.allplan_attribute_id) + " & value: " + str(current_attribute.value)
+            return False, "Current Attribute: None"
 
-                        attribute_type = AllplanHelpers.get_attribute_type_for_attribute_id(attribute.allplan_attribute_id)
+    @staticmethod
+    def __get_attribute_tuples(converted_attributes, create_timestamp_attribute, timestamp):
+        attribute_tuples = AllplanHelpers.__get_unit_attribute_tuples(converted_attributes)
+        if(create_timestamp_attribute):
+            attribute_tuples.extend(AllplanHelpers.__get_timestamp_attribute_tuples(timestamp))
+        return attribute_tuples
 
-                        if(attribute_type == AllplanBaseElements.AttributeService.String):
-                            attributes.add_attribute_by_unit(int(attribute.allplan_attribute_id), str(attribute.value))
-                        elif(attribute_type == AllplanBaseElements.AttributeService.Double):
-                            attributes.add_attribute_by_unit(int(attribute.allplan_attribute_id), float(attribute.value))
-                        elif(attribute_type == AllplanBaseElements.AttributeService.Integer):
-                            attributes.add_attribute_by_unit(int(attribute.allplan_attribute_id), int(attribute.value))
+    @staticmethod
+    def __get_unit_attribute_tuples(converted_attributes):
+        attributes = BuildingElementAttributeList()
+        for attribute_id, _, value in converted_attributes:
+            attributes.add_attribute_by_unit(attribute_id, value)
+        return list(attributes.get_attributes_list_as_tuples())
 
+    @staticmethod
+    def __get_timestamp_attribute_tuples(timestamp):
+        attributes = BuildingElementAttributeList()
+        try:
+            attributes.add_attribute(27553, timestamp)
+        except:
+            pass
+        return list(attributes.get_attributes_list_as_tuples())
 
-                    if(create_timestamp_attribute):
-                        try:
-                            attributes.add_attribute(27553, str(datetime.datetime.now().strftime("%Y-%m-%d %H:%M")))
-                        except:
-                            pass
+    @staticmethod
+    def __is_attribute_value_equal(attribute_converter, current_value, value) -> bool:
+        if current_value is None or attribute_converter is None:
+            return False
+        try:
+            return attribute_converter(current_value) == value
+        except (TypeError, ValueError):
+            return False
 
-                    attr_list = attributes.get_attributes_list_as_tuples()
-                    element_list = AllplanElementAdapter.BaseElementAdapterList()
-                    for allplan_element in rebar_element.allplan_elements:
-                        element_list.append(allplan_element)
-                    AllplanBaseElements.ElementsAttributeService.ChangeAttributes(attr_list, element_list)
 
-            return True, None
-        except:
-            return False, current_attribute
+
+class ParseSnapshot():
+    """Result of the previous run on a document, used by the incremental mode
+    - the parsed rows are stored per BVBS line, unchanged lines are copied from the snapshot instead of being parsed again
+    - the attribute values and Allplan elements per line are stored as well, bars that would be written with the same values are skipped
+    - lines are identified by a hash of their text and the occurrence of that text, so identical lines are kept apart
+    - the snapshot is saved with pickle in the Allplan temp folder, as plain data so it does not depend on the module name
+    - the snapshot key (project, BVBS file and drawing files) is stored in the file, a snapshot of another document,
+      another format or one that can not be read is discarded
+    """
+    FORMAT = "BendingMachineWizard.ParseSnapshot"
+    VERSION = 2 # the layout of the RebarTable
+
+    def __init__(self, preference_values, snapshot_key = None):
+        self.preference_values = preference_values
+        self.snapshot_key = snapshot_key
+        self.line_keys = []
+        self.rebar_table = RebarTable() # rows as parsed, before the segment attributes, couplers and totals are applied
+        self.written_attributes = {}
+        # the same data of the previous run, empty when there was no usable snapshot
+        self.previous_line_keys = []
+        self.previous_rebar_table = RebarTable()
+        self.previous_written_attributes = {}
 
     @staticmethod
-    def round(value, user_preference):
-        round_value = int(user_preference)
-        calc_value = int(value)
-        return round(calc_value / round_value) * round_value
+    def get_preference_values(attribute_preferences):
+        # parsed rows can only be reused with the same attribute preferences
+        return {key: str(preference[0].value) for key, preference in attribute_preferences.items()}
 
+    @staticmethod
+    def get_line_keys(bvbs_data_lines):
+        import hashlib
+        line_keys = []
+        occurrences = {}
+        for data_line in bvbs_data_lines:
+            line_hash = hashlib.blake2b(data_line.encode("utf-8"), digest_size=16).digest()
+            occurrence = occurrences.get(line_hash, 0)
+            occurrences[line_hash] = occurrence + 1
+            line_keys.append((line_hash, occurrence))
+        return line_keys
 
-class RebarElement():
-    """An Element of Rebar container which is used throughout the program to contain all information necessary to execution:
-    - the values of the attributes
-    - the shape information
-    - the placement information
-    - segment angles and lengths
-    - the associated Allplan objects
+    @staticmethod
+    def get_rebar_identity(rebar_element):
+        # a bar that was edited keeps its mark and assembly, that is how changed bars are told apart from added bars
+        return (rebar_element.mark.value if rebar_element.mark else None, rebar_element.assembly.value if rebar_element.assembly else None)
+
+    @staticmethod
+    def load(file_path, attribute_preferences, snapshot_key):
+        """ Returns the snapshot for this run, with the previous run loaded if it exists, is of the same document and format
+            and used the same preferences. Any other snapshot file is deleted, the run starts from the export.
+        """
+        import pickle
+        snapshot = ParseSnapshot(ParseSnapshot.get_preference_values(attribute_preferences), snapshot_key)
+        if(not os.path.isfile(file_path)):
+            return snapshot
+        try:
+            with open(file_path, "rb") as snapshot_file:
+                data = pickle.load(snapshot_file)
+            if(not isinstance(data, dict) or data.get("format") != ParseSnapshot.FORMAT or data.get("version") != ParseSnapshot.VERSION
+               or data.get("snapshot_key") != snapshot_key):
+                raise ValueError("snapshot of another document or format")
+            if(data["preference_values"] != snapshot.preference_values):
+                return snapshot
+            previous_rebar_table = RebarTable()
+            previous_rebar_table.__dict__.update(data["rebar_table"])
+            snapshot.previous_line_keys = data["line_keys"]
+            snapshot.previous_rebar_table = previous_rebar_table
+            snapshot.previous_written_attributes = data["written_attributes"]
+        except Exception as exc:
+            AllplanHelpers.log("ParseSnapshot.load", "previous snapshot discarded: " + str(exc), False)
+            snapshot = ParseSnapshot(snapshot.preference_values, snapshot_key)
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+        return snapshot
+
+    def save(self, file_path):
+        import pickle
+        data = {"format": ParseSnapshot.FORMAT,
+                "version": ParseSnapshot.VERSION,
+                "snapshot_key": self.snapshot_key,
+                "preference_values": self.preference_values,
+                "line_keys": self.line_keys,
+                "rebar_table": vars(self.rebar_table),
+                "written_attributes": self.written_attributes}
+        with open(file_path, "wb") as snapshot_file:
+            pickle.dump(data, snapshot_file, pickle.HIGHEST_PROTOCOL)
+
+    def get_rebar_to_write(self, rebar_elements):
+        """ Stores the attributes and Allplan elements of every bar, returns the bars that differ from the previous run.
+        The rows of the bars are the line numbers, the bars have to come from the table built by the incremental parse.
+        """
+        rebar_to_write = []
+        for rebar_element in rebar_elements:
+            line_key = self.line_keys[rebar_element.row]
+            written = (tuple((attribute.allplan_attribute_id, attribute.value) for attribute in rebar_element.get_attributes_as_list() if attribute),
+                       tuple(str(allplan_element.GetElementUUID()) for allplan_element in rebar_element.allplan_elements))
+            self.written_attributes[line_key] = written
+            if self.previous_written_attributes.get(line_key) != written:
+                rebar_to_write.append(rebar_element)
+        return rebar_to_write
+
+
+class RebarMarkIndex():
+    """A hash index on the RebarElements to match the Allplan placements without scanning the complete list
+    - keyed on the mark for placements outside of an assembly, on (mark, assembly) for placements in an assembly
+    - only the first RebarElement of a key is kept, the same one a scan through the list would find first
     """
-    def __init__(self) -> None:
-        self.shape_type = None
-        self.allplan_elements = []
-        self.allplan_placement_type = None
-        self.geometry_type = None
-        self.mark = None
-        self.is_circular_reinforcement = False
-        self.is_part_of_assembly = False
-        self.total_length = None
-        self.diameter = None
-        self.bend_angle = None
-        self.assembly = None
-        self.coupler_start = None
-        self.coupler_end = None
-        self.coupler_start_fabricant = None
-        self.coupler_start_type = None
-        self.coupler_end_fabricant = None
-        self.coupler_end_type = None
-        self.segment_lengths = []
-        self.segment_angles = []
-        self.amount_total = None
-        self.amount_assembly = None
-        self.radius = None
-        self.segment_angles_bendingpins = []
-
-
-    def adjust_first_last_segment_when_coupler(self):
-        # Ensure we have Allplan elements and at least one coupler flag enabled
-        if not self.allplan_elements or not (self.coupler_start or self.coupler_end):
-            return False
+    def __init__(self, rebar_elements = None):
+        self.rebar_by_mark = {}
+        self.rebar_by_mark_and_assembly = {}
+        for rebar_element in rebar_elements or []:
+            self.add(rebar_element)
+
+    def add(self, rebar_element):
+        mark = str(rebar_element.mark.value)
+        self.rebar_by_mark.setdefault(mark, rebar_element)
+        if rebar_element.assembly:
+            self.rebar_by_mark_and_assembly.setdefault((mark, str(rebar_element.assembly.value)), rebar_element)
+
+    def find(self, mark, assembly_id = None):
+        if not assembly_id:
+            return self.rebar_by_mark.get(str(mark))
+        return self.rebar_by_mark_and_assembly.get((str(mark), str(assembly_id)))
+
+
+class RebarPipeline():
+    """Takes the bars through the stages after the parse while the BVBS file is still being parsed, instead of one stage after the other
+    - the parse hands over every batch of bars (every chunk in the parallel parse) as soon as it is in the table
+    - per batch the segment attributes are named, the segments keep the attribute name as ID for now, and the bars are added to the mark index
+    - no Allplan API is used while parsing: once the last line is parsed, create_segment_attributes() looks up or creates
+      the distinct attribute names once and replaces the names by the attribute IDs in the tables
+    - when the segment attributes fail, segment_attributes_ok is False, the run reports it as before
+    """
+    def __init__(self, attribute_preferences, attribute_type = None):
+        self.attribute_preferences = attribute_preferences
+        self.attribute_type = attribute_type
+        self.rebar_elements = []
+        self.rebar_index = RebarMarkIndex()
+        self.attribute_definitions = {}
+        self.rebar_tables = []
+        self.segment_attributes_ok = True
+
+    def add_rows(self, rebar_table: RebarTable, first_row: int, end_row: int):
+        rebar_elements = [RebarTableRow(rebar_table, row) for row in range(first_row, end_row)]
+        self.rebar_elements.extend(rebar_elements)
+        if not any(table is rebar_table for table in self.rebar_tables):
+            self.rebar_tables.append(rebar_table)
+        attribute_definitions, segment_attribute_names = AllplanHelpers.get_segment_attribute_names(rebar_elements, self.attribute_preferences, self.attribute_type)
+        AllplanHelpers.set_segment_attribute_ids(rebar_elements, segment_attribute_names, {name: name for name in attribute_definitions})
+        for attribute_name, attribute_definition in attribute_definitions.items():
+            self.attribute_definitions.setdefault(attribute_name, attribute_definition)
+        for rebar_element in rebar_elements:
+            self.rebar_index.add(rebar_element)
 
-        # Get the fixtures from the first Allplan element
-        fixtures = AllplanElementAdapter.BaseElementAdapterChildElementsService.GetChildElements(self.allplan_elements[0], True)
-        if not fixtures:
-            return False
+    def create_segment_attributes(self) -> bool:
+        """ Call once the parse succeeded, creates the segment attributes that do not exist yet in Allplan """
+        try:
+            attribute_ids = AllplanHelpers.get_attribute_catalogue().get_attribute_ids(self.attribute_definitions)
+            for rebar_table in self.rebar_tables:
+                rebar_table.replace_segment_attribute_ids({name: attribute_ids[name] for name in self.attribute_definitions})
+        except RunCancelledError:
+            raise
+        except Exception as exc:
+            AllplanHelpers.log("RebarPipeline", exc, True)
+            self.segment_attributes_ok = False
+        return self.segment_attributes_ok
 
-        # Retrieve the fixture with display name 'Symbol fixture'
-        fixture = next((obj for obj in fixtures if obj.GetDisplayName() == 'Symbol fixture'), None)
-        if not fixture:
-            return False
 
-        # Get the attributes of the fixture
-        attributes = AllplanBaseElements.ElementsAttributeService.GetAttributes(
-            fixture, AllplanBaseElements.eAttibuteReadState.ReadAllAndComputable
-        )
-        if not attributes:
-            return False
+class AttributeWritePlan():
+    """Groups the Allplan elements that get exactly the same attribute list
+    - every distinct attribute list is written with one ChangeAttributes call for all of its elements
+    - identical bars, e.g. the same stirrup in many walls, no longer cost one call each
+    """
+    def __init__(self):
+        self.elements_by_attributes = {}
+
+    def add(self, attr_list, allplan_elements):
+        self.elements_by_attributes.setdefault(tuple(attr_list), []).extend(allplan_elements)
+
+    def write(self) -> int:
+        """ Returns the amount of ChangeAttributes calls """
+        write_calls = 0
+        for attr_list, allplan_elements in self.elements_by_attributes.items():
+            if not allplan_elements:
+                continue
+            element_list = AllplanElementAdapter.BaseElementAdapterList()
+            for allplan_element in allplan_elements:
+                element_list.append(allplan_element)
+            AllplanBaseElements.ElementsAttributeService.ChangeAttributes(list(attr_list), element_list)
+            write_calls = write_calls + 1
+            # a cancelled run does not stop between two calls, it stops at the next stage once everything is written
+            AllplanHelpers.progress_step(cancellable=False)
+        return write_calls
+
+
+class AttributeCatalogue():
+    """A cache of the Allplan attribute definitions used during one run of the wizard in the current document
+    - attribute name -> attribute ID, user attributes which do not exist yet are created once
+    - attribute ID -> converter of the value to the attribute type, the type is read once
+    """
+    def __init__(self):
+        self.attribute_ids = {}
+        self.attribute_converters = {}
 
-        # Retrieve the fixture length and convert it to a float
-        fixture_length = AllplanHelpers.linear_search(attributes, 1238)
-        if not fixture_length:
-            return False
-        fixture_length = round(float(fixture_length[1]))
+    def get_attribute_ids(self, attribute_definitions):
+        """ Look up or create the attributes that are not in the catalogue yet.
+        Args:
+            attribute_definitions: {attribute name: (attribute type, attribute dimension)}
+        Returns:
+            {attribute name: attribute ID} for all attributes in the catalogue
+        """
+        for attribute_name, (attribute_type, attribute_dimension) in attribute_definitions.items():
+            if attribute_name not in self.attribute_ids:
+                self.attribute_ids[attribute_name] = AllplanHelpers.create_new_attribute_in_allplan(attribute_name, attribute_type, attribute_dimension)
+        return self.attribute_ids
+
+    def get_attribute_converters(self, attribute_ids):
+        """ Read the type of the attribute IDs that are not in the catalogue yet.
+        Returns:
+            {attribute ID: str, float or int} to convert a value to the attribute type, None for types that are not written
+        """
+        for attribute_id in attribute_ids:
+            if attribute_id not in self.attribute_converters:
+                attribute_type = AllplanHelpers.get_attribute_type_for_attribute_id(attribute_id)
+                self.attribute_converters[attribute_id] = AttributeCatalogue.__get_converter_for_attribute_type(attribute_type)
+        return self.attribute_converters
 
-        # Ensure segment_lengths is not empty and convert each RebarElementAttribute.value to a float if needed
-        if not self.segment_lengths:
-            return False
-        for segment in self.segment_lengths:
-            if isinstance(segment.value, str):
-                try:
-                    segment.value = float(segment.value)
-                except ValueError:
-                    return False  # Conversion failed; handle as needed
-
-        # Adjust segments based on the coupler flags
-        if len(self.segment_lengths) == 1:
-            # For a single segment, add fixture_length for each enabled coupler flag
-            if self.coupler_start.value == "True":
-                self.segment_lengths[0].value += fixture_length
-            if self.coupler_end.value == "True":
-                self.segment_lengths[0].value += fixture_length
-        else:
-            # For multiple segments, update the first and/or last segment as needed
-            if self.coupler_start.value == "True":
-                self.segment_lengths[0].value += fixture_length
-            if self.coupler_end.value == "True":
-                self.segment_lengths[-1].value += fixture_length
+    @staticmethod
+    def __get_converter_for_attribute_type(attribute_type):
+        if(attribute_type == AllplanBaseElements.AttributeService.String):
+            return str
+        elif(attribute_type == AllplanBaseElements.AttributeService.Double):
+            return float
+        elif(attribute_type == AllplanBaseElements.AttributeService.Integer):
+            return int
+        return None
 
-        return True
 
+class CouplerFixtureCatalogue():
+    """A cache of the coupler fixture lengths during one run of the wizard
+    - the length depends on the coupler types and on the diameter of the bar, the cache is keyed by both from the BVBS data of the bar
+    - the cache is checked first, the child elements of a placement are only searched for the fixture on a cache miss
+    - a bar without a fixture gets no length and keeps its segments, its key stays open for the next bar with that coupler
+    - only the stored fixture length is read, the computable attributes are only read when the length is not stored
+    """
+    FIXTURE_LENGTH_ATTRIBUTE_ID = 1238
 
-    def __init_bvbs_geometry(self, bvbs_geometry, geometry_type, attribute_preferences):
-        if geometry_type == ShapeType.SHAPE2D:
-            upper_limit = 400
-            rebar_diameter = 10
-            length_counter = 0
-            angle_counter = 1
-            is_first_angle_and_length_after_arc = False # Allplan BUG l=0 values skip
-            for index, geo in enumerate(bvbs_geometry):
-                    if(geo.startswith("l")):
-                        geo_value = geo.replace("l","",1)
-                        if geo_value == "0":
-                            continue
-                        self.segment_lengths.append(RebarElementAttribute(length_counter, geo_value))
-                        length_counter+=2
-
-                    if(geo.startswith("w")):
-                        if is_first_angle_and_length_after_arc:
-                            #self.segment_angles.append(RebarElementAttribute(angle_counter, "0")) # add a zero angle because it is missing
-                            is_first_angle_and_length_after_arc = False
-                        geo_value = geo.replace("w","",1)
-                        self.segment_angles.append(RebarElementAttribute(angle_counter, geo_value))
-                        angle_counter+=2
-
-                    if(geo.startswith("r")):
-                        geo_value = geo.replace("r","",1)
-                        if float(geo_value) > upper_limit:
-                            try: # case arc created by user and this is the r value describing the arc (defined by upper limit)
-                                arc_radius = float(bvbs_geometry[index].replace("r","",1)) # radius starts with r
-                                self.radius = RebarElementAttribute(attribute_preferences["arcradius"][0].value, str(arc_radius))
-                                arc_angle = float(bvbs_geometry[index+1].replace("w","",1)) # BVBS definition r should be followed with w
-                                arc_length = str(self.__calculate_arc_length(arc_radius, arc_angle))
-                                self.segment_lengths.append(RebarElementAttribute(length_counter, arc_length))
-                                length_counter+=2
-                                is_first_angle_and_length_after_arc = True
-                            except:
-                                Exception("[Exception] Circular shape does not contain required parameters in BVBS")
-                        else: # case fake bending pin created by user and this is the r value describing the bending pin
-                            bp_radius = float(geo.replace("r","",1)) # bending pin radius
-                            bending_pin = ( bp_radius *2 ) / rebar_diameter
-                            self.segment_angles_bendingpins.append(RebarElementAttribute(angle_counter, bending_pin))
-
-        else: # ShapeType.SHAPE3D
-            vectors = []
-            temp_x = None
-            temp_y = None
-            temp_z = None
-            for geo in bvbs_geometry:
-                if(geo.startswith("x")):
-                    temp_x = geo.replace("x","")
-                if(geo.startswith("y")):
-                    temp_y = geo.replace("y","")
-                if(geo.startswith("z")):
-                    temp_z = geo.replace("z","")
-                if temp_z and temp_y and temp_x:
-                    vectors.append(Vector(Point(temp_x, temp_y, temp_z)))
-                    temp_x = None
-                    temp_y = None
-                    temp_z = None
-
-            # starting point is 0,0,0
-            points = []
-            pt1 = Point(0,0,0)
-            points.append(Point(0,0,0))
-            for vector in vectors:
-                pt1 = pt1.move(vector)
-                points.append(Point(pt1.x, pt1.y, pt1.z))
-
-            # calculate lengths ( segments = # points-1)
-            temp_length_list = []
-            for index in range(len(points) - 1):
-                pt1 = points[index]
-                pt2 = points[index + 1]
-                distance = pt1.distance(pt2)
-                self.segment_lengths.append(RebarElementAttribute("undefined", str(distance)))
-
-            # calculate angles (angles = # points-2)
-            for index in range(len(points) - 2):
-                pt1 = points[index]
-                pt2 = points[index + 1]
-                pt3 = points[index + 2]
-                v1 = Vector(pt1, pt2)
-                v2 = Vector(pt2, pt3)
-                angle = v1.angle_with(v2)
-                self.segment_angles.append(RebarElementAttribute("undefined", str(angle)))
-
-        # check if the last value is zero. In that case it should be removed.
-        if len(self.segment_angles) > 0:
-            if str(self.segment_angles[len(self.segment_angles)-1].value) == "0":
-                self.segment_angles.pop()
-
-    def __split_string_at_capitals(self, input_string):
-        # Use regex to find the pattern '@' followed by an uppercase letter
-        pattern = r'(@[A-Z])'
-        parts = re.split(pattern, input_string)
-        return parts
-
-    def __calculate_arc_length(self, radius, angle):
-        pi = np.pi
-        arc_length = (2 * pi * radius) * (angle / 360)
-        return arc_length
-
-    def init_from_bvbs(self, data_line : str, attribute_preferences):
-
-        if("BF2D@" in data_line):
-            self.shape_type = ShapeType.SHAPE2D
-        elif("BF3D@" in data_line):
-            self.shape_type = ShapeType.SHAPE3D
-        else:
-            raise Exception(" [Exception] Unsupported shape: " + data_line)
+    def __init__(self):
+        self.fixture_lengths = {}
+        self.fixture_reads = 0
 
-        bvbs_parts = self.__split_string_at_capitals(data_line)
-        bvbs_coupler = None
-        bvbs_header = None
-        bvbs_geometry = None
-        bvbs_assembly = None
+    def get_fixture_lengths(self, rebar_elements):
+        """ Resolve the fixture lengths of all bars with a coupler in one pass.
+        Returns:
+            the fixture length per bar, None for bars without a coupler, without a fixture or without a fixture length
+        """
+        fixture_lengths = []
+        for rebar_element in rebar_elements:
+            fixture_length = None
+            if rebar_element.allplan_elements and (rebar_element.coupler_start or rebar_element.coupler_end):
+                fixture_key = CouplerFixtureCatalogue.__get_fixture_key(rebar_element)
+                if fixture_key is not None and fixture_key in self.fixture_lengths:
+                    fixture_length = self.fixture_lengths[fixture_key]
+                else:
+                    fixture = CouplerFixtureCatalogue.__get_fixture(rebar_element.allplan_elements[0])
+                    if fixture is not None:
+                        fixture_length = self.__read_fixture_length(fixture)
+                        if fixture_key is not None:
+                            self.fixture_lengths[fixture_key] = fixture_length
+            fixture_lengths.append(fixture_length)
+        return fixture_lengths
 
-        try:
-            bvbs_coupler_index = bvbs_parts.index("@M")
-            bvbs_coupler = bvbs_parts[bvbs_coupler_index+1]
-        except ValueError:
-            pass # no couplers
+    @staticmethod
+    def __get_fixture(allplan_element):
+        """ The 'Symbol fixture' of the bar placement, None if the placement has none """
+        fixtures = AllplanElementAdapter.BaseElementAdapterChildElementsService.GetChildElements(allplan_element, True)
+        if not fixtures:
+            return None
+        return next((obj for obj in fixtures if obj.GetDisplayName() == 'Symbol fixture'), None)
 
-        try:
-            bvbs_assembly_index = bvbs_parts.index("@P")
-            bvbs_assembly = bvbs_parts[bvbs_assembly_index+1]
-            self.is_part_of_assembly = True
-        except ValueError:
-            pass # no assembly
+    @staticmethod
+    def __get_fixture_key(rebar_element):
+        """ The BVBS coupler types of the enabled coupler flags and the diameter, None if the bar has no coupler type """
+        coupler_types = tuple(coupler_type.value if coupler_flag and coupler_flag.value == "True" and coupler_type and coupler_type.value else None
+                              for coupler_flag, coupler_type in ((rebar_element.coupler_start, rebar_element.coupler_start_type),
+                                                                 (rebar_element.coupler_end, rebar_element.coupler_end_type)))
+        if coupler_types == (None, None):
+            return None
+        return coupler_types + (rebar_element.diameter.value if rebar_element.diameter else None,)
+
+    def __read_fixture_length(self, fixture):
+        self.fixture_reads = self.fixture_reads + 1
+        fixture_length = CouplerFixtureCatalogue.__find_fixture_length(fixture, AllplanBaseElements.eAttibuteReadState.ReadAll)
+        if fixture_length is None:
+            fixture_length = CouplerFixtureCatalogue.__find_fixture_length(fixture, AllplanBaseElements.eAttibuteReadState.ReadAllAndComputable)
+        if not fixture_length:
+            return None
+        return round(float(fixture_length))
 
-        try:
-            bvbs_geometry_index = bvbs_parts.index("@G")
-            bvbs_header_index = bvbs_parts.index("@H")
-            bvbs_header = bvbs_parts[bvbs_header_index+1]
-            bvbs_geometry = bvbs_parts[bvbs_geometry_index+1]
-        except ValueError:
-            raise Exception(" [Exception] Syntax error in data: " + data_line + "\nHeader information missing!") # this is not fine
-
-        # now we have the data ordered in an easy line per type
-
-        ### HEADER ###
-        bvbs_header = bvbs_header.split("@")
-        for bvbs_element in bvbs_header:
-            if(bvbs_element.startswith("p")):
-                bvbs_value = bvbs_element.replace("p","",1)
-                self.mark = RebarElementAttribute(attribute_preferences["rebarmark"][0].value, bvbs_value)
-            if(bvbs_element.startswith("l")):
-                bvbs_value = bvbs_element.replace("l","",1)
-                bvbs_value = str(AllplanHelpers.round(bvbs_value, attribute_preferences["rounding"][0].value))
-                self.total_length = RebarElementAttribute(attribute_preferences["rebarlength"][0].value, bvbs_value)
-            if(bvbs_element.startswith("d")):
-                bvbs_value = bvbs_element.replace("d","",1)
-                self.diameter = RebarElementAttribute(attribute_preferences["rebardiameter"][0].value, bvbs_value)
-            if(bvbs_element.startswith("s")):
-                bvbs_value = bvbs_element.replace("s","",1)
-                self.bend_angle = RebarElementAttribute(attribute_preferences["rebarbending"][0].value, bvbs_value)
-            if(bvbs_element.startswith("n")):
-                bvbs_value = bvbs_element.replace("n","",1)
-                if self.is_part_of_assembly:
-                    self.amount_assembly = RebarElementAttribute(attribute_preferences["rebaramountassembly"][0].value, bvbs_value)
-                else:
-                    self.amount_total = RebarElementAttribute(attribute_preferences["rebaramounttotal"][0].value, bvbs_value)
-
-        ### ASSEMBLY ###
-        if bvbs_assembly:
-            bvbs_assembly = bvbs_assembly.split("@")
-            for bvbs_element in bvbs_assembly:
-                if(bvbs_element.startswith("t")):
-                    bvbs_value = bvbs_element.replace("t","",1)
-                    self.assembly = RebarElementAttribute(attribute_preferences["rebarassembly"][0].value, bvbs_value)
-
-        ### COUPLERS ###
-        if bvbs_coupler:
-            bvbs_coupler = bvbs_coupler.split("@")
-            for bvbs_element in bvbs_coupler:
-                if(bvbs_element.startswith("c")):
-                    bvbs_value = bvbs_element.replace("c","",1)
-                    if(bvbs_value == "1"):
-                        self.coupler_start = RebarElementAttribute(attribute_preferences["rebarcouplerstart"][0].value, "True")
-                    else:
-                        self.coupler_start = RebarElementAttribute(attribute_preferences["rebarcouplerstart"][0].value, "False")
-                if(bvbs_element.startswith("p")):
-                    bvbs_value = bvbs_element.replace("p","",1)
-                    if(bvbs_value == "1"):
-                        self.coupler_end = RebarElementAttribute(attribute_preferences["rebarcouplerend"][0].value, "True")
-                    else:
-                        self.coupler_end = RebarElementAttribute(attribute_preferences["rebarcouplerend"][0].value, "False")
-                if(bvbs_element.startswith("a")):
-                    bvbs_value = bvbs_element.replace("a","",1)
-                    if(not bvbs_value.isdigit()):
-                        self.coupler_start_fabricant = RebarElementAttribute(attribute_preferences["rebarcouplerstartfabricant"][0].value, bvbs_value)
-                if(bvbs_element.startswith("b")):
-                    bvbs_value = bvbs_element.replace("b","",1)
-                    self.coupler_start_type = RebarElementAttribute(attribute_preferences["rebarcouplerstarttype"][0].value, bvbs_value)
-                if(bvbs_element.startswith("n")):
-                    bvbs_value = bvbs_element.replace("n","",1)
-                    if(not bvbs_value.isdigit()):
-                        self.coupler_end_fabricant = RebarElementAttribute(attribute_preferences["rebarcouplerendfabricant"][0].value, bvbs_value)
-                if(bvbs_element.startswith("o")):
-                    bvbs_value = bvbs_element.replace("o","",1)
-                    self.coupler_end_type = RebarElementAttribute(attribute_preferences["rebarcouplerendtype"][0].value, bvbs_value)
-
-        ### GEOMETRY ###
-        bvbs_geometry = bvbs_geometry.split("@")
-        self.__init_bvbs_geometry(bvbs_geometry, self.shape_type, attribute_preferences)
-
-    def get_attributes_as_list(self):
-        attributes_list = []
-        attributes_list.append(self.mark)
-        attributes_list.append(self.total_length)
-        attributes_list.append(self.diameter)
-        attributes_list.append(self.bend_angle)
-        attributes_list.append(self.assembly)
-        attributes_list.append(self.coupler_start)
-        attributes_list.append(self.coupler_end)
-        attributes_list.append(self.coupler_start_fabricant)
-        attributes_list.append(self.coupler_end_type)
-        attributes_list.append(self.coupler_start_type)
-        attributes_list.append(self.coupler_end_fabricant)
-        attributes_list.append(self.amount_total)
-        attributes_list.append(self.amount_assembly)
-        attributes_list.append(self.radius)
-        for segment_length in self.segment_lengths:
-            attributes_list.append(segment_length)
-        for segment_angle in self.segment_angles:
-            attributes_list.append(segment_angle)
-        for segment_angle_bendingpin in self.segment_angles_bendingpins:
-            attributes_list.append(segment_angle_bendingpin)
-        return attributes_list
-
-
-class Vector():
-    """A 3D vector, only used to calculate the vectors of 3D rebar
-    contains functions to calculate the angle between two vectors.
+    @staticmethod
+    def __find_fixture_length(fixture, read_state):
+        attributes = AllplanBaseElements.ElementsAttributeService.GetAttributes(fixture, read_state)
+        return next((value for attribute_id, value in attributes or () if attribute_id == CouplerFixtureCatalogue.FIXTURE_LENGTH_ATTRIBUTE_ID), None)
+
+
+class DrawingFile():
+    """A loaded drawing file of the project
+    - the file number as integer
+    - the name as shown in the palette: "<number>-<name>"
+    - the state of the file as returned by the DrawingFileService (active, active in background, reference)
     """
-    def __init__(self, point_a, point_b = None):
-        if point_b:
-            self.x = point_b.x - point_a.x
-            self.y = point_b.y - point_a.y
-            self.z = point_b.z - point_a.z
-        else:
-            self.x = point_a.x
-            self.y = point_a.y
-            self.z = point_a.z
-        self.array = np.array([self.x, self.y, self.z])
-
-    def __dot_product(self, other_vector):
-        return np.dot(self.array, other_vector.array)
-
-    def magnitude(self):
-        return np.linalg.norm(self.array)
-
-    def angle_with(self, other_vector):
-        dot_prod = self.__dot_product(other_vector)
-        mag_v1 = self.magnitude()
-        mag_v2 = other_vector.magnitude()
-        cos_theta = dot_prod / (mag_v1 * mag_v2)
-        angle_rad = np.arccos(cos_theta)
-        angle_deg = np.degrees(angle_rad)
-        return round(angle_deg)
-
-
-class Point():
-    """A 3D point
-    - point can be moved by means of a vector. Will save movement into the point (self)
-    - point distance with another point can be calculated with the distance method.
+    def __init__(self, number, name, state):
+        self.number = number
+        self.name = name
+        self.state = state
+
+
+class DrawingFileCatalogue():
+    """A cache of the drawing files loaded in the project, shared by the IFC export file list and the file selection
+    - refresh() reads the file state of the project, only when it changed the list of drawing files is rebuilt
+    - the name of a file number is read from Allplan once
+    - version counts the rebuilds, so users of the list can tell if it changed since they last read it
+    """
+    def __init__(self):
+        self.file_state = None
+        self.drawing_files = []
+        self.file_numbers_by_name = {}
+        self.names_by_file_number = {}
+        self.version = 0
+
+    def refresh(self) -> bool:
+        """ Returns True if the drawing files changed """
+        file_state = [(int(file_index), state) for file_index, state in AllplanBaseElements.DrawingFileService().GetFileState()]
+        if file_state == self.file_state:
+            return False
+        self.file_state = file_state
+        self.drawing_files = [DrawingFile(file_number, self.__get_name(file_number), state) for file_number, state in file_state]
+        self.file_numbers_by_name = {drawing_file.name: drawing_file.number for drawing_file in self.drawing_files}
+        self.version = self.version + 1
+        return True
+
+    def get_file_number(self, name):
+        """ None for a name that is not loaded, e.g. from the file list of a favorite """
+        return self.file_numbers_by_name.get(name)
+
+    def __get_name(self, file_number) -> str:
+        if file_number not in self.names_by_file_number:
+            self.names_by_file_number[file_number] = AllplanElementAdapter.DocumentNameService.GetDocumentNameByFileNumber(file_number, True, False, "-")
+        return self.names_by_file_number[file_number]
+
+
+class IfcExportJob():
+    """An IFC export that is queued once the attributes are written, so CONFIRM returns before the export ran
+    - the Allplan API is only used from the main thread: the job runs synchronously from the "Export now" button, see IfcExportQueue
+    - the drawing files, path, version and theme are copied when the job is created, later palette changes do not affect it
+    - the export service is any object with ExportIFC(doc, file numbers, version, path, theme), a stand-in can be used for tests
+    - the state and the status text can be read at any time
     """
-    def __init__(self, x,y,z):
-        self.x = int(x)
-        self.y = int(y)
-        self.z = int(z)
-
-    def move(self, vector):
-        self.x = self.x + vector.x
-        self.y = self.y + vector.y
-        self.z = self.z + vector.z
-        return self
-
-    def distance(self, other_point):
-        x1 = (self.x)
-        y1 = (self.y)
-        z1 = (self.z)
-        x2 = (other_point.x)
-        y2 = (other_point.y)
-        z2 = (other_point.z)
-        distance = math.sqrt((x2 - x1)**2 + (y2 - y1)**2 + (z2 - z1)**2)
-        return round(distance)
-
-
-class RebarElementAttribute():
-    """An container that contains one single attribute of a Rebar Element in Allplan
-    The attribute container is populated by a value through BVBS.
-    - the allplan attribute ID is the ID of the associated attribute in Allplan
-    - the value is the value to be written to Allplan.
+    def __init__(self, export_service, doc, export_file_numbers, file_path, ifc_version, ifc_theme):
+        self.export_service = export_service
+        self.doc = doc
+        self.export_file_numbers = list(export_file_numbers)
+        self.file_path = file_path
+        self.ifc_version = ifc_version
+        self.ifc_theme = ifc_theme
+        self.state = IfcExportState.QUEUED
+        self.error = None
+        self.seconds = None
+
+    def run(self):
+        """ Runs the export, only a queued job runs """
+        if self.state != IfcExportState.QUEUED:
+            return
+        started = time.perf_counter()
+        try:
+            self.export_service.ExportIFC(self.doc, self.export_file_numbers, self.ifc_version, self.file_path, self.ifc_theme)
+            self.state = IfcExportState.FINISHED
+        except Exception as exc:
+            self.error = exc
+            AllplanHelpers.log("IfcExportJob", exc, True)
+            self.state = IfcExportState.FAILED
+        self.seconds = time.perf_counter() - started
+
+    def cancel(self) -> bool:
+        """ Returns False when the job already ran """
+        if self.state != IfcExportState.QUEUED:
+            return False
+        self.state = IfcExportState.CANCELLED
+        return True
+
+    def get_status_text(self) -> str:
+        if self.state == IfcExportState.QUEUED:
+            return "IFC export queued, " + str(len(self.export_file_numbers)) + " drawing files"
+        if self.state == IfcExportState.FINISHED:
+            return "IFC export finished in %.1f s: " % self.seconds + str(self.file_path)
+        if self.state == IfcExportState.CANCELLED:
+            return "IFC export cancelled"
+        return "IFC export failed: " + AllplanHelpers.get_exception_message(self.error)
+
+
+class IfcExportQueue():
+    """The IFC export jobs of the wizard, run one after the other on the main thread
+    - the "Export now" button of the summary tab runs all queued jobs with run_next()
+    - the jobs run in the order they were added, two exports never run at the same time
+    - cancel() drops the jobs that did not run yet, e.g. when the palette is closed
+    - the status text is the one of the last added job
     """
-    def __init__(self, allplan_attribute_id, allplan_value_to_write):
-        self.allplan_attribute_id = allplan_attribute_id
-        self.value = allplan_value_to_write
+    def __init__(self):
+        self.jobs = []
+        self.last_job = None
+
+    def add(self, job: IfcExportJob):
+        self.jobs.append(job)
+        self.last_job = job
+
+    def run_next(self) -> bool:
+        """ Returns True if a job ran """
+        if not self.jobs:
+            return False
+        self.jobs.pop(0).run()
+        return True
+
+    def cancel(self) -> int:
+        """ Returns the amount of cancelled jobs """
+        cancelled_jobs = sum(1 for job in self.jobs if job.cancel())
+        self.jobs = []
+        return cancelled_jobs
+
+    def get_status_text(self) -> str:
+        """ None before the first job """
+        if self.last_job is None:
+            return None
+        return self.last_job.get_status_text()
 
 
 class AssemblyElement():
@@ -1366,3 +2047,6 @@ class AssemblyElement():
     def __init__(self, assembly_name, rebar_uuids):
         self.assembly_name = assembly_name
         self.rebar_uuids = rebar_uuids
+
+
+MODULE_LOAD_SECONDS = time.perf_counter() - MODULE_LOAD_STARTED
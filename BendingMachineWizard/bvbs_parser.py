@@ -0,0 +1,708 @@
+"""
+Parsing of BVBS files into RebarTables for the bending machine wizard.
+No Allplan module is imported here: the parallel parse starts worker processes that only import this module,
+and the parse can run outside of Allplan. Progress is reported through a callback passed in by the wizard.
+"""
+
+import mmap
+import os
+from array import array
+from enum import Enum
+from typing import Callable, Iterable
+
+
+class ShapeType(Enum):
+    SHAPE2D = 0
+    SHAPE3D = 1
+
+
+class RunCancelledError(Exception):
+    """The user cancelled the run, raised by the progress callback at the next progress update or stage, the parse lets it pass"""
+    pass
+
+
+class AttributePreference():
+    """Plain copy of an attribute preference from the palette, so the preferences can be sent to the parse worker processes"""
+
+    def __init__(self, value):
+        self.value = value
+
+
+class BVBSFileReader():
+    """Streams the lines of a BVBS file instead of reading the complete file into a list.
+    - the file is memory mapped, only the line that is being parsed is decoded into a string
+    - the encoding is explicit, BVBS files are written by Allplan in the Windows ANSI codepage
+    - line endings are normalised to "\n", same as a text mode readlines() would return
+    """
+    def __init__(self, file_path: str, encoding: str = "cp1252"):
+        self.file_path = file_path
+        self.encoding = encoding
+
+    def __iter__(self):
+        with open(self.file_path, "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return # an empty file cannot be memory mapped
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+                for raw_line in iter(mapped_file.readline, b""):
+                    yield raw_line.decode(self.encoding).replace("\r\n", "\n")
+
+    def get_line_count(self) -> int:
+        """ Counts the lines without decoding them, for the progress of the parse stage """
+        line_count = 0
+        last_block = b""
+        with open(self.file_path, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                line_count = line_count + block.count(b"\n")
+                last_block = block
+        if last_block and not last_block.endswith(b"\n"):
+            line_count = line_count + 1
+        return line_count
+
+
+# a BVBS block starts with '@' followed by one of these letters
+BVBS_BLOCK_LETTERS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+
+# dispatch table block letter -> field letter -> (column, attribute preference), the value is the field without its leading letter.
+# the geometry block is not in here, its fields are collected in order and handled by RebarTable.__append_geometry
+BVBS_FIELD_COLUMNS = {
+    "H": {"p": ("mark", "rebarmark"),
+          "l": ("total_length", "rebarlength"),
+          "d": ("diameter", "rebardiameter"),
+          "s": ("bend_angle", "rebarbending"),
+          "n": ("amount_total", "rebaramounttotal")},
+    "P": {"t": ("assembly", "rebarassembly")},
+    "M": {"c": ("coupler_start", "rebarcouplerstart"),
+          "p": ("coupler_end", "rebarcouplerend"),
+          "a": ("coupler_start_fabricant", "rebarcouplerstartfabricant"),
+          "b": ("coupler_start_type", "rebarcouplerstarttype"),
+          "n": ("coupler_end_fabricant", "rebarcouplerendfabricant"),
+          "o": ("coupler_end_type", "rebarcouplerendtype")},
+}
+
+NO_NUMBER = float("nan") # None in the number and segment columns
+
+
+def format_number(value: float):
+    """ The text of a number as it is written in BVBS, integral numbers without decimals """
+    if value != value: # NaN
+        return None
+    if value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class RebarTable():
+    """Columnar storage of the parsed bars, the BVBS lines are parsed straight into the columns
+    - numbers (length, diameter, bending pin, amounts, arc radius) are stored in typed float arrays, NaN for None
+    - texts (mark, assembly, coupler fabricants and types) are interned once in a value pool, the columns hold the index in the pool (-1 for None)
+    - coupler flags are stored as -1 (None), 0 (False) or 1 (True)
+    - the Allplan attribute ID is stored once per column
+    - the segments (lengths, angles, bending pins) of all bars are stored in flat float arrays, with an offset and a count per bar.
+      The attribute ID of a segment depends on its letter, the segment attribute IDs are pooled
+    - values are read as text, the same as in the BVBS line, so they are written to Allplan as before
+    - rows() returns RebarTableRow views, which can be used wherever a RebarElement was used
+    """
+    NUMBER_COLUMNS = ["total_length", "diameter", "bend_angle", "amount_total", "amount_assembly", "radius"]
+    TEXT_COLUMNS = ["mark", "assembly", "coupler_start_fabricant", "coupler_start_type", "coupler_end_fabricant", "coupler_end_type"]
+    FLAG_COLUMNS = ["coupler_start", "coupler_end"]
+    SEGMENT_COLUMNS = ["segment_lengths", "segment_angles", "segment_angles_bendingpins"]
+    FLAG_VALUES = ["False", "True"]
+    NUMBER_COLUMN_SET = frozenset(NUMBER_COLUMNS)
+    TEXT_COLUMN_SET = frozenset(TEXT_COLUMNS)
+    FLAG_COLUMN_SET = frozenset(FLAG_COLUMNS)
+
+    def __init__(self):
+        self.row_count = 0
+        self.value_pool = []
+        self.value_pool_indices = {}
+        self.shape_types = array("b")
+        self.is_part_of_assembly = array("b")
+        self.columns = {column: array("d") for column in RebarTable.NUMBER_COLUMNS}
+        self.columns.update({column: array("i") for column in RebarTable.TEXT_COLUMNS})
+        self.columns.update({column: array("b") for column in RebarTable.FLAG_COLUMNS})
+        self.column_attribute_ids = {column: None for column in self.columns}
+        self.segment_offsets = {column: array("q") for column in RebarTable.SEGMENT_COLUMNS}
+        self.segment_counts = {column: array("i") for column in RebarTable.SEGMENT_COLUMNS}
+        self.segment_values = {column: array("d") for column in RebarTable.SEGMENT_COLUMNS}
+        self.segment_attribute_ids = {column: array("i") for column in RebarTable.SEGMENT_COLUMNS}
+        # only the matched bars have Allplan elements
+        self.allplan_elements = {}
+        self.allplan_placement_types = {}
+
+    def __len__(self):
+        return self.row_count
+
+    def pool_value(self, value) -> int:
+        if value is None:
+            return -1
+        key = (type(value), value) # keeps 1, 1.0 and True apart
+        index = self.value_pool_indices.get(key)
+        if index is None:
+            index = len(self.value_pool)
+            self.value_pool.append(value)
+            self.value_pool_indices[key] = index
+        return index
+
+    def pooled_value(self, index):
+        return None if index < 0 else self.value_pool[index]
+
+    @staticmethod
+    def to_number(column, value) -> float:
+        if value is None:
+            return NO_NUMBER
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            raise Exception(" [Exception] " + column + " is not a number: " + str(value))
+
+    def append_bvbs(self, data_line: str, attribute_preferences, geometry_engine: "RebarGeometryEngine" = None) -> int:
+        """ Parse one BVBS line into a new row, returns the row number.
+        Args:
+            geometry_engine: a RebarGeometryEngine to calculate the geometry together with other bars.
+                             The segment lengths and angles are only complete after its compute().
+                             Without an engine the geometry of this bar is calculated immediately.
+        """
+        if("BF2D@" in data_line):
+            shape_type = ShapeType.SHAPE2D
+        elif("BF3D@" in data_line):
+            shape_type = ShapeType.SHAPE3D
+        else:
+            raise Exception(" [Exception] Unsupported shape: " + data_line)
+
+        # single pass over the line: a block starts with '@' followed by a capital letter, its fields are separated by '@'.
+        # only the first occurrence of a block is used, the part before the first block (BF2D/BF3D) is skipped.
+        found_blocks = set()
+        block_columns = {}
+        fields = {}
+        bvbs_geometry = None
+        geometry_fields = None
+        tokens = iter(data_line.split("@"))
+        next(tokens) # BF2D / BF3D
+        for token in tokens:
+            field_letter = token[:1]
+            if field_letter in BVBS_BLOCK_LETTERS:
+                block_columns = {}
+                geometry_fields = None
+                if field_letter not in found_blocks:
+                    found_blocks.add(field_letter)
+                    if field_letter == "G":
+                        bvbs_geometry = geometry_fields = []
+                    else:
+                        block_columns = BVBS_FIELD_COLUMNS.get(field_letter, block_columns)
+                token = token[1:]
+                field_letter = token[:1]
+            if geometry_fields is not None:
+                geometry_fields.append(token)
+                continue
+            field_column = block_columns.get(field_letter)
+            if field_column:
+                fields[field_column] = token[1:]
+
+        if "H" not in found_blocks or bvbs_geometry is None:
+            raise Exception(" [Exception] Syntax error in data: " + data_line + "\nHeader information missing!") # this is not fine
+
+        row = self.row_count
+        self.row_count = self.row_count + 1
+        self.shape_types.append(shape_type.value)
+        self.is_part_of_assembly.append(1 if "P" in found_blocks else 0)
+        for column, values in self.columns.items():
+            values.append(NO_NUMBER if column in RebarTable.NUMBER_COLUMN_SET else -1)
+        for column, segment_values in self.segment_values.items():
+            self.segment_offsets[column].append(len(segment_values))
+            self.segment_counts[column].append(0)
+
+        for (column, preference), bvbs_value in fields.items():
+            if column == "total_length":
+                bvbs_value = round_to(bvbs_value, attribute_preferences["rounding"][0].value)
+            elif column in RebarTable.FLAG_COLUMN_SET:
+                bvbs_value = "True" if bvbs_value == "1" else "False"
+            elif column in ("coupler_start_fabricant", "coupler_end_fabricant") and bvbs_value.isdigit():
+                continue
+            elif column == "amount_total" and "P" in found_blocks:
+                # the header comes before the assembly block, the amount of a bar in an assembly is the assembly amount
+                column, preference = "amount_assembly", "rebaramountassembly"
+            self.set_value(column, row, attribute_preferences[preference][0].value, bvbs_value)
+
+        ### GEOMETRY ###
+        if geometry_engine is None:
+            single_geometry_engine = RebarGeometryEngine()
+            self.__append_geometry(row, bvbs_geometry, shape_type, attribute_preferences, single_geometry_engine)
+            single_geometry_engine.compute()
+        else:
+            self.__append_geometry(row, bvbs_geometry, shape_type, attribute_preferences, geometry_engine)
+        return row
+
+    def __append_geometry(self, row, bvbs_geometry, shape_type, attribute_preferences, geometry_engine):
+        if shape_type == ShapeType.SHAPE2D:
+            upper_limit = 400
+            rebar_diameter = 10
+            length_counter = 0
+            angle_counter = 1
+            segment_lengths = [] # (attribute ID, value), an arc length is None until the geometry engine calculated it
+            segment_angles = []
+            segment_angles_bendingpins = []
+            arcs = [] # (index in the segment lengths, radius, angle)
+            for index, geo in enumerate(bvbs_geometry):
+                    if(geo.startswith("l")):
+                        geo_value = geo.replace("l","",1)
+                        if geo_value == "0":
+                            continue
+                        segment_lengths.append((length_counter, geo_value))
+                        length_counter+=2
+
+                    if(geo.startswith("w")):
+                        geo_value = geo.replace("w","",1)
+                        segment_angles.append((angle_counter, geo_value))
+                        angle_counter+=2
+
+                    if(geo.startswith("r")):
+                        geo_value = geo.replace("r","",1)
+                        if float(geo_value) > upper_limit:
+                            try: # case arc created by user and this is the r value describing the arc (defined by upper limit)
+                                arc_radius = float(bvbs_geometry[index].replace("r","",1)) # radius starts with r
+                                self.set_value("radius", row, attribute_preferences["arcradius"][0].value, arc_radius)
+                                arc_angle = float(bvbs_geometry[index+1].replace("w","",1)) # BVBS definition r should be followed with w
+                                arcs.append((len(segment_lengths), arc_radius, arc_angle))
+                                segment_lengths.append((length_counter, None))
+                                length_counter+=2
+                            except:
+                                Exception("[Exception] Circular shape does not contain required parameters in BVBS")
+                        else: # case fake bending pin created by user and this is the r value describing the bending pin
+                            bp_radius = float(geo.replace("r","",1)) # bending pin radius
+                            bending_pin = ( bp_radius *2 ) / rebar_diameter
+                            segment_angles_bendingpins.append((angle_counter, bending_pin))
+
+            # the last angle is removed when it is zero
+            if segment_angles and segment_angles[-1][1] == "0":
+                segment_angles.pop()
+            self.set_segment_values("segment_lengths", row, segment_lengths)
+            self.set_segment_values("segment_angles", row, segment_angles)
+            self.set_segment_values("segment_angles_bendingpins", row, segment_angles_bendingpins)
+            offset = self.segment_offsets["segment_lengths"][row]
+            for length_index, arc_radius, arc_angle in arcs:
+                geometry_engine.add_arc(self, offset + length_index, arc_radius, arc_angle)
+
+        else: # ShapeType.SHAPE3D
+            vectors = []
+            temp_x = None
+            temp_y = None
+            temp_z = None
+            for geo in bvbs_geometry:
+                if(geo.startswith("x")):
+                    temp_x = geo.replace("x","")
+                if(geo.startswith("y")):
+                    temp_y = geo.replace("y","")
+                if(geo.startswith("z")):
+                    temp_z = geo.replace("z","")
+                if temp_z and temp_y and temp_x:
+                    vectors.append((int(temp_x), int(temp_y), int(temp_z)))
+                    temp_x = None
+                    temp_y = None
+                    temp_z = None
+            # lengths ( segments = # vectors) and angles ( angles = # vectors-1) are calculated by the geometry engine
+            geometry_engine.add_segment_vectors(self, row, vectors)
+
+    def rows(self):
+        return [RebarTableRow(self, row) for row in range(self.row_count)]
+
+    def extend(self, rebar_table, rows: Iterable[int] = None):
+        """ Append rows of another table (all rows by default), the texts are moved into the value pool of this table """
+        rows = range(rebar_table.row_count) if rows is None else list(rows)
+        pool_indices = [self.pool_value(value) for value in rebar_table.value_pool]
+        pool_indices.append(-1) # index -1 (None) stays -1
+        self.shape_types.extend([rebar_table.shape_types[row] for row in rows])
+        self.is_part_of_assembly.extend([rebar_table.is_part_of_assembly[row] for row in rows])
+        for column, values in self.columns.items():
+            attribute_id = rebar_table.column_attribute_ids[column]
+            if self.column_attribute_ids[column] is None:
+                self.column_attribute_ids[column] = attribute_id
+            elif attribute_id is not None and attribute_id != self.column_attribute_ids[column]:
+                raise Exception(" [Exception] Column " + column + " can only hold attribute ID " + str(self.column_attribute_ids[column]))
+            source_values = rebar_table.columns[column]
+            if column in RebarTable.TEXT_COLUMN_SET:
+                values.extend([pool_indices[source_values[row]] for row in rows])
+            else:
+                values.extend([source_values[row] for row in rows])
+        for column in RebarTable.SEGMENT_COLUMNS:
+            source_offsets = rebar_table.segment_offsets[column]
+            source_counts = rebar_table.segment_counts[column]
+            source_values = rebar_table.segment_values[column]
+            source_attribute_ids = rebar_table.segment_attribute_ids[column]
+            values = self.segment_values[column]
+            attribute_ids = self.segment_attribute_ids[column]
+            for row in rows:
+                offset = source_offsets[row]
+                count = source_counts[row]
+                self.segment_offsets[column].append(len(values))
+                self.segment_counts[column].append(count)
+                values.extend(source_values[offset:offset + count])
+                attribute_ids.extend([pool_indices[index] for index in source_attribute_ids[offset:offset + count]])
+        for new_row, row in enumerate(rows, self.row_count):
+            if rebar_table.allplan_elements.get(row):
+                self.allplan_elements[new_row] = list(rebar_table.allplan_elements[row])
+            if row in rebar_table.allplan_placement_types:
+                self.allplan_placement_types[new_row] = rebar_table.allplan_placement_types[row]
+        self.row_count = self.row_count + len(rows)
+
+    def get_attribute(self, column, row):
+        value = self.columns[column][row]
+        if column in RebarTable.NUMBER_COLUMN_SET:
+            value = format_number(value)
+            return None if value is None else RebarElementAttribute(self.column_attribute_ids[column], value)
+        if value < 0:
+            return None
+        if column in RebarTable.FLAG_COLUMN_SET:
+            return RebarElementAttribute(self.column_attribute_ids[column], RebarTable.FLAG_VALUES[value])
+        return RebarElementAttribute(self.column_attribute_ids[column], self.value_pool[value])
+
+    def set_attribute(self, column, row, attribute):
+        if attribute is None:
+            self.columns[column][row] = NO_NUMBER if column in RebarTable.NUMBER_COLUMN_SET else -1
+            return
+        self.set_value(column, row, attribute.allplan_attribute_id, attribute.value)
+
+    def set_value(self, column, row, attribute_id, value):
+        if self.column_attribute_ids[column] is None:
+            self.column_attribute_ids[column] = attribute_id
+        elif self.column_attribute_ids[column] != attribute_id:
+            raise Exception(" [Exception] Column " + column + " can only hold attribute ID " + str(self.column_attribute_ids[column]))
+        if column in RebarTable.NUMBER_COLUMN_SET:
+            self.columns[column][row] = RebarTable.to_number(column, value)
+        elif column in RebarTable.FLAG_COLUMN_SET:
+            self.columns[column][row] = RebarTable.FLAG_VALUES.index(value)
+        else:
+            self.columns[column][row] = self.pool_value(value)
+
+    def get_segments(self, column, row):
+        offset = self.segment_offsets[column][row]
+        return [RebarTableSegment(self, column, index) for index in range(offset, offset + self.segment_counts[column][row])]
+
+    def set_segments(self, column, row, attributes):
+        self.set_segment_values(column, row, [(attribute.allplan_attribute_id, attribute.value) for attribute in attributes])
+
+    def set_segment_values(self, column, row, segments):
+        """ segments: [(attribute ID, value)], they are overwritten in place, a row with more segments than before is moved to the end of the flat arrays """
+        if not segments and not self.segment_counts[column][row]:
+            return
+        values = self.segment_values[column]
+        attribute_ids = self.segment_attribute_ids[column]
+        if len(segments) > self.segment_counts[column][row]:
+            self.segment_offsets[column][row] = len(values)
+            values.extend([NO_NUMBER] * len(segments))
+            attribute_ids.extend([-1] * len(segments))
+        offset = self.segment_offsets[column][row]
+        for index, (attribute_id, value) in enumerate(segments):
+            values[offset + index] = RebarTable.to_number(column, value)
+            attribute_ids[offset + index] = self.pool_value(attribute_id)
+        self.segment_counts[column][row] = len(segments)
+
+    def replace_segment_attribute_ids(self, attribute_ids):
+        """ Replace the segment attribute IDs {old ID: new ID} in all rows, e.g. the attribute names by the Allplan attribute IDs """
+        pool_indices = {self.pool_value(old_id): self.pool_value(new_id) for old_id, new_id in attribute_ids.items()}
+        for column, segment_attribute_ids in self.segment_attribute_ids.items():
+            self.segment_attribute_ids[column] = array("i", [pool_indices.get(index, index) for index in segment_attribute_ids])
+
+    @staticmethod
+    def column_property(column):
+        return property(lambda row_view: row_view.table.get_attribute(column, row_view.row),
+                        lambda row_view, attribute: row_view.table.set_attribute(column, row_view.row, attribute))
+
+    @staticmethod
+    def segment_property(column):
+        return property(lambda row_view: row_view.table.get_segments(column, row_view.row),
+                        lambda row_view, attributes: row_view.table.set_segments(column, row_view.row, attributes))
+
+
+class RebarTableRow():
+    """A view on one bar of a RebarTable with the attributes and methods of the former RebarElement:
+    - the values of the attributes
+    - the shape information
+    - the placement information
+    - segment angles and lengths
+    - the associated Allplan objects
+    Attributes are read from and written to the columns of the table, RebarElementAttributes are created when read.
+    """
+    __slots__ = ("table", "row")
+    is_circular_reinforcement = False
+    geometry_type = None
+
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+
+    mark = RebarTable.column_property("mark")
+    total_length = RebarTable.column_property("total_length")
+    diameter = RebarTable.column_property("diameter")
+    bend_angle = RebarTable.column_property("bend_angle")
+    assembly = RebarTable.column_property("assembly")
+    coupler_start = RebarTable.column_property("coupler_start")
+    coupler_end = RebarTable.column_property("coupler_end")
+    coupler_start_fabricant = RebarTable.column_property("coupler_start_fabricant")
+    coupler_start_type = RebarTable.column_property("coupler_start_type")
+    coupler_end_fabricant = RebarTable.column_property("coupler_end_fabricant")
+    coupler_end_type = RebarTable.column_property("coupler_end_type")
+    amount_total = RebarTable.column_property("amount_total")
+    amount_assembly = RebarTable.column_property("amount_assembly")
+    radius = RebarTable.column_property("radius")
+    segment_lengths = RebarTable.segment_property("segment_lengths")
+    segment_angles = RebarTable.segment_property("segment_angles")
+    segment_angles_bendingpins = RebarTable.segment_property("segment_angles_bendingpins")
+
+    @property
+    def shape_type(self):
+        shape_type = self.table.shape_types[self.row]
+        return None if shape_type < 0 else ShapeType(shape_type)
+
+    @property
+    def is_part_of_assembly(self):
+        return bool(self.table.is_part_of_assembly[self.row])
+
+    @property
+    def allplan_elements(self):
+        return self.table.allplan_elements.get(self.row, ())
+
+    def add_allplan_element(self, allplan_element):
+        self.table.allplan_elements.setdefault(self.row, []).append(allplan_element)
+
+    @property
+    def allplan_placement_type(self):
+        return self.table.allplan_placement_types.get(self.row)
+
+    @allplan_placement_type.setter
+    def allplan_placement_type(self, allplan_placement_type):
+        self.table.allplan_placement_types[self.row] = allplan_placement_type
+
+    def adjust_first_last_segment_when_coupler(self, fixture_length):
+        """ fixture_length: the length of the coupler fixture of the bar, see CouplerFixtureCatalogue """
+        # Ensure we have Allplan elements and at least one coupler flag enabled
+        if not self.allplan_elements or not (self.coupler_start or self.coupler_end):
+            return False
+        return self.apply_coupler_fixture_lengths(fixture_length, fixture_length)
+
+    def apply_coupler_fixture_lengths(self, start_fixture_length, end_fixture_length):
+        """ Adds the fixture lengths to the first and last segment for the enabled coupler flags, no Allplan API is used """
+        # Ensure segment_lengths is not empty, the lengths are numbers in the table
+        segment_lengths = self.segment_lengths
+        if not segment_lengths or any(segment.value is None for segment in segment_lengths):
+            return False
+
+        # Adjust segments based on the coupler flags
+        if len(segment_lengths) == 1:
+            # For a single segment, add fixture_length for each enabled coupler flag
+            if self.coupler_start.value == "True":
+                segment_lengths[0].value = float(segment_lengths[0].value) + start_fixture_length
+            if self.coupler_end.value == "True":
+                segment_lengths[0].value = float(segment_lengths[0].value) + end_fixture_length
+        else:
+            # For multiple segments, update the first and/or last segment as needed
+            if self.coupler_start.value == "True":
+                segment_lengths[0].value = float(segment_lengths[0].value) + start_fixture_length
+            if self.coupler_end.value == "True":
+                segment_lengths[-1].value = float(segment_lengths[-1].value) + end_fixture_length
+
+        return True
+
+    def get_attributes_as_list(self):
+        attributes_list = []
+        attributes_list.append(self.mark)
+        attributes_list.append(self.total_length)
+        attributes_list.append(self.diameter)
+        attributes_list.append(self.bend_angle)
+        attributes_list.append(self.assembly)
+        attributes_list.append(self.coupler_start)
+        attributes_list.append(self.coupler_end)
+        attributes_list.append(self.coupler_start_fabricant)
+        attributes_list.append(self.coupler_end_type)
+        attributes_list.append(self.coupler_start_type)
+        attributes_list.append(self.coupler_end_fabricant)
+        attributes_list.append(self.amount_total)
+        attributes_list.append(self.amount_assembly)
+        attributes_list.append(self.radius)
+        for segment_length in self.segment_lengths:
+            attributes_list.append(segment_length)
+        for segment_angle in self.segment_angles:
+            attributes_list.append(segment_angle)
+        for segment_angle_bendingpin in self.segment_angles_bendingpins:
+            attributes_list.append(segment_angle_bendingpin)
+        return attributes_list
+
+
+class RebarTableSegment():
+    """A view on one segment value in a RebarTable, behaves as a RebarElementAttribute"""
+    __slots__ = ("table", "column", "index")
+
+    def __init__(self, table, column, index):
+        self.table = table
+        self.column = column
+        self.index = index
+
+    @property
+    def allplan_attribute_id(self):
+        return self.table.pooled_value(self.table.segment_attribute_ids[self.column][self.index])
+
+    @allplan_attribute_id.setter
+    def allplan_attribute_id(self, allplan_attribute_id):
+        self.table.segment_attribute_ids[self.column][self.index] = self.table.pool_value(allplan_attribute_id)
+
+    @property
+    def value(self):
+        return format_number(self.table.segment_values[self.column][self.index])
+
+    @value.setter
+    def value(self, value):
+        self.table.segment_values[self.column][self.index] = RebarTable.to_number(self.column, value)
+
+
+class RebarGeometryError(Exception):
+    """The geometry of one bar can not be calculated, row is the row of the bar in its RebarTable"""
+    def __init__(self, row, message):
+        super().__init__(message)
+        self.row = row
+
+
+class RebarGeometryEngine():
+    """Calculates the geometry of many bars at once with NumPy, instead of one NumPy call per vector
+    - BF3D: the segment vectors (x/y/z deltas) of all bars are kept in one ragged array (flat vectors + segment count per bar).
+      Segment lengths and angles between consecutive segments are calculated in one go.
+    - BF2D: the arc lengths of all bars are calculated in one go
+    - rounding is the same as for a single bar: round() on the lengths and on the angles in degrees
+    - the results are written into the segment columns of the RebarTable of the bar
+    Bars are calculated by compute(), which also happens automatically every BATCH_SIZE bars to limit memory.
+    A bar whose geometry fails raises RebarGeometryError with its row, so the error is reported on its own line.
+    """
+    BATCH_SIZE = 10000
+
+    def __init__(self):
+        self.__reset()
+
+    def __reset(self):
+        self.rebar_3d = []
+        self.segment_counts = []
+        self.segment_vectors = []
+        self.arc_lengths = []
+        self.arc_radii = []
+        self.arc_angles = []
+
+    def add_segment_vectors(self, rebar_table, row, segment_vectors):
+        self.rebar_3d.append((rebar_table, row))
+        self.segment_counts.append(len(segment_vectors))
+        self.segment_vectors.extend(segment_vectors)
+        if len(self.rebar_3d) >= RebarGeometryEngine.BATCH_SIZE:
+            self.compute()
+
+    def add_arc(self, rebar_table, segment_index, arc_radius, arc_angle):
+        """ segment_index: the index of the arc length in the flat segment lengths of the table """
+        self.arc_lengths.append((rebar_table, segment_index))
+        self.arc_radii.append(arc_radius)
+        self.arc_angles.append(arc_angle)
+        if len(self.arc_lengths) >= RebarGeometryEngine.BATCH_SIZE:
+            self.compute()
+
+    def compute(self):
+        if self.rebar_3d:
+            self.__compute_segments()
+        if self.arc_lengths:
+            self.__compute_arcs()
+        self.__reset()
+
+    def __compute_segments(self):
+        import numpy as np
+        vectors = np.array(self.segment_vectors, dtype=np.int64).reshape(-1, 3)
+        magnitudes = np.sqrt((vectors * vectors).sum(axis=1).astype(np.float64))
+
+        # a segment has a next segment in the same bar, unless it is the last segment of its bar
+        bar_ends = np.cumsum(self.segment_counts)
+        has_next_segment = np.ones(len(vectors), dtype=bool)
+        has_next_segment[bar_ends[bar_ends > 0] - 1] = False
+        first_segments = np.flatnonzero(has_next_segment)
+        dot_products = (vectors[first_segments] * vectors[first_segments + 1]).sum(axis=1)
+        # a zero length vector gives a NaN angle, the bar raises its own error when the angle is rounded
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cos_theta = dot_products / (magnitudes[first_segments] * magnitudes[first_segments + 1])
+            angles = np.degrees(np.arccos(cos_theta)).tolist()
+
+        lengths = magnitudes.tolist()
+        segment_index = 0
+        angle_index = 0
+        for (rebar_table, row), segment_count in zip(self.rebar_3d, self.segment_counts):
+            try:
+                # the segments are numbered as for BF2D, lengths 0, 2, 4... (A, C, E...) and angles 1, 3, 5... (B, D, F...)
+                segment_lengths = [(index * 2, round(length)) for index, length in enumerate(lengths[segment_index:segment_index + segment_count])]
+                segment_index = segment_index + segment_count
+                angle_count = max(segment_count - 1, 0)
+                segment_angles = [(index * 2 + 1, round(angle)) for index, angle in enumerate(angles[angle_index:angle_index + angle_count])]
+                angle_index = angle_index + angle_count
+            except (ValueError, OverflowError) as exc:
+                raise RebarGeometryError(row, " [Exception] invalid 3D geometry: " + str(exc)) from exc
+            # the last angle is removed when it is zero
+            if segment_angles and segment_angles[-1][1] == 0:
+                segment_angles.pop()
+            rebar_table.set_segment_values("segment_lengths", row, segment_lengths)
+            rebar_table.set_segment_values("segment_angles", row, segment_angles)
+
+    def __compute_arcs(self):
+        import numpy as np
+        radii = np.array(self.arc_radii, dtype=np.float64)
+        angles = np.array(self.arc_angles, dtype=np.float64)
+        arc_lengths = ((2 * np.pi * radii) * (angles / 360)).tolist()
+        for (rebar_table, segment_index), arc_length in zip(self.arc_lengths, arc_lengths):
+            rebar_table.segment_values["segment_lengths"][segment_index] = arc_length
+
+
+class RebarElementAttribute():
+    """An container that contains one single attribute of a Rebar Element in Allplan
+    The attribute container is populated by a value through BVBS.
+    - the allplan attribute ID is the ID of the associated attribute in Allplan
+    - the value is the value to be written to Allplan.
+    """
+    def __init__(self, allplan_attribute_id, allplan_value_to_write):
+        self.allplan_attribute_id = allplan_attribute_id
+        self.value = allplan_value_to_write
+
+
+def round_to(value, user_preference):
+    round_value = int(user_preference)
+    calc_value = int(value)
+    return round(calc_value / round_value) * round_value
+
+
+def get_exception_message(exc: Exception) -> str:
+    if hasattr(exc, 'message'):
+        return exc.Message
+    else:
+        return exc.args[0]
+
+
+def parse_bvbs_lines(bvbs_data_lines: Iterable[str], attribute_preferences, first_line_number: int = 1, progress_step: Callable[[], None] = None,
+                     pipeline = None) -> tuple["RebarTable", int]:
+    """ Parses the lines into a RebarTable, returns the table and the amount of lines.
+    Also runs in the parse worker processes, without progress_step and pipeline.
+    Every batch of bars is handed to the pipeline (add_rows(table, first row, end row)) as soon as it is in the table.
+    """
+    # the geometry of the bars is calculated in batches, once a batch is complete its rows are handed to the pipeline
+    rebar_table = RebarTable()
+    line_count = 0
+    first_row = 0
+    geometry_engine = RebarGeometryEngine()
+    try: # the lines can be streamed from the file, so reading errors surface here as well
+        for data_line in bvbs_data_lines:
+            line_count = line_count + 1
+            if(progress_step is not None):
+                progress_step()
+            rebar_table.append_bvbs(data_line, attribute_preferences, geometry_engine)
+            if rebar_table.row_count - first_row >= RebarGeometryEngine.BATCH_SIZE:
+                geometry_engine.compute()
+                if pipeline is not None:
+                    pipeline.add_rows(rebar_table, first_row, rebar_table.row_count)
+                first_row = rebar_table.row_count
+        geometry_engine.compute()
+    except RunCancelledError:
+        raise
+    except RebarGeometryError as exc:
+        # the geometry is calculated per batch, the error names the row of the bar, every line is one row of the table
+        raise Exception("BVBS line " + str(first_line_number + exc.row) + ":" + get_exception_message(exc))
+    except Exception as exc:
+        raise Exception("BVBS line " + str(first_line_number + line_count - 1) + ":" + get_exception_message(exc))
+    if pipeline is not None:
+        pipeline.add_rows(rebar_table, first_row, rebar_table.row_count)
+    return rebar_table, line_count
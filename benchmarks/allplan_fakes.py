@@ -0,0 +1,245 @@
+"""
+Loads the bending machine wizard outside of Allplan and provides lightweight fakes of the Allplan element adapters and
+attribute services used by the wizard. The benchmarks and tools/bvbs_batch.py load the wizard only through load_wizard().
+
+The Allplan modules (NemAll_Python_* and the PythonParts framework) are replaced by placeholder modules before the wizard
+is imported. Looking up names on them works, so the module can be imported, but calling anything raises
+AllplanNotAvailableError. FakeAllplan.install() replaces the Allplan modules in a loaded wizard by the fakes, any Allplan
+call that is not faked here still raises AllplanNotAvailableError. The fakes keep their data in plain dicts and lists and
+count the calls, so the benchmarks measure the wizard and not the fakes.
+"""
+
+import importlib
+import importlib.util
+import itertools
+import sys
+import time
+from pathlib import Path
+from types import ModuleType, SimpleNamespace
+
+WIZARD_PATH = Path(__file__).resolve().parent.parent / "BendingMachineWizard" / "bendingmachinewizard.py"
+ALLPLAN_MODULES = ["NemAll_Python_IFW_ElementAdapter", "NemAll_Python_IFW_Input", "NemAll_Python_BaseElements",
+                   "NemAll_Python_Utility", "NemAll_Python_AllplanSettings", "NemAll_Python_Reinforcement",
+                   "ServiceExamples", "Utils", "Utils.LibraryBitmapPreview", "BuildingElementStringTable",
+                   "AnyValueByType", "BuildingElement", "BuildingElementComposite", "BuildingElementPaletteService",
+                   "StringTableService", "ControlProperties", "BuildingElementListService", "CreateElementResult",
+                   "BuildingElementTupleUtil", "BuildingElementAttributeList", "ControlPropertiesUtil"]
+
+
+class AllplanNotAvailableError(RuntimeError):
+    pass
+
+
+class AllplanPlaceholder():
+    """Stands in for any name of an Allplan module, e.g. AllplanBaseElements.AttributeService.AttributeType.Double"""
+
+    def __init__(self, name):
+        self.__name = name
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return AllplanPlaceholder(self.__name + "." + name)
+
+    def __call__(self, *args, **kwargs):
+        raise AllplanNotAvailableError(self.__name + " can not be used outside of Allplan")
+
+    def __repr__(self):
+        return "<" + self.__name + ">"
+
+
+class AllplanPlaceholderModule(ModuleType):
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return AllplanPlaceholder(self.__name__ + "." + name)
+
+
+def load_wizard(module_path = WIZARD_PATH, module_name = "bendingmachinewizard"):
+    """ Import the wizard with placeholders for the Allplan modules that are not installed """
+    for name in ALLPLAN_MODULES:
+        if name in sys.modules:
+            continue
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            sys.modules[name] = AllplanPlaceholderModule(name)
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    # every version of the wizard imports the bvbs_parser next to it, not the one an earlier version imported
+    sys.modules.pop("bvbs_parser", None)
+    wizard_folder = str(Path(module_path).resolve().parent)
+    if wizard_folder in sys.path:
+        sys.path.remove(wizard_folder)
+    sys.path.insert(0, wizard_folder)
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module # needed to send the wizard classes to worker processes
+    spec.loader.exec_module(module)
+    return module
+
+
+STRING = "String"
+DOUBLE = "Double"
+INTEGER = "Integer"
+READ_ALL = 0
+READ_ALL_AND_COMPUTABLE = 1
+
+
+class FakeElementAdapterType():
+
+    def __init__(self, display_name, guid):
+        self.DisplayName = display_name
+        self.guid = guid
+
+    def GetGuid(self):
+        return self.guid
+
+
+class FakeElement():
+    """Element adapter of a bar placement (or a fixture), with its position and attributes"""
+    __uuids = itertools.count(1)
+
+    def __init__(self, position, sub_position, element_adapter_type, display_name = "Bar placement", attributes = None):
+        self.position = position
+        self.sub_position = sub_position
+        self.element_adapter_type = element_adapter_type
+        self.display_name = display_name
+        self.attributes = dict(attributes or {})
+        self.children = []
+        self.uuid = "00000000-0000-0000-0000-%012d" % next(FakeElement.__uuids)
+
+    def GetElementAdapterType(self):
+        return self.element_adapter_type
+
+    def GetElementUUID(self):
+        return self.uuid
+
+    def GetDisplayName(self):
+        return self.display_name
+
+    def GetAttributes(self, read_state):
+        return list(self.attributes.items())
+
+
+class FakeBarPositionData():
+
+    def __init__(self, element):
+        self.element = element
+
+    def GetSubPosition(self):
+        return self.element.sub_position
+
+
+class FakeAttributeService():
+    """Attribute definitions of a document: name -> ID and ID -> type, user attributes are added from ID 10000"""
+    String = STRING
+    Double = DOUBLE
+    Integer = INTEGER
+    AttributeType = SimpleNamespace(String=STRING, Double=DOUBLE, Integer=INTEGER)
+    AttributeControlType = SimpleNamespace(Edit="Edit")
+
+    def __init__(self, attribute_types = None):
+        self.attribute_types = dict(attribute_types or {})
+        self.attribute_ids = {}
+        self.calls = 0
+
+    def GetAttributeID(self, doc, attribute_name):
+        self.calls = self.calls + 1
+        return self.attribute_ids.get(attribute_name, -1)
+
+    def AddUserAttribute(self, doc, attributeType, attributeName, **kwargs):
+        self.calls = self.calls + 1
+        attribute_id = 10000 + len(self.attribute_ids)
+        self.attribute_ids[attributeName] = attribute_id
+        self.attribute_types[attribute_id] = attributeType
+        return attribute_id
+
+    def GetAttributeType(self, doc, attribute_id):
+        self.calls = self.calls + 1
+        return self.attribute_types.get(int(attribute_id), STRING)
+
+
+class FakeElementsAttributeService():
+    """Applies the written attributes to the fake elements"""
+
+    def __init__(self):
+        self.calls = 0
+        self.written_attributes = 0
+
+    def ChangeAttributes(self, attributes, elements):
+        self.calls = self.calls + 1
+        for element in elements:
+            element.attributes.update(attributes)
+            self.written_attributes = self.written_attributes + len(attributes)
+
+    def GetAttributes(self, element, read_state):
+        return list(element.attributes.items())
+
+
+class FakeBuildingElementAttributeList():
+
+    def __init__(self):
+        self.attributes = []
+
+    def add_attribute_by_unit(self, attribute_id, value):
+        self.attributes.append((attribute_id, value))
+
+    def add_attribute(self, attribute_id, value):
+        self.attributes.append((attribute_id, value))
+
+    def get_attributes_list_as_tuples(self):
+        return self.attributes
+
+
+class FakeExportImportService():
+    """ExportIFC takes export_seconds per drawing file, the exports are kept in the order they ran"""
+
+    def __init__(self, export_seconds = 0.0, failing_paths = ()):
+        self.export_seconds = export_seconds
+        self.failing_paths = set(failing_paths)
+        self.exports = []
+
+    def ExportIFC(self, doc, export_file_numbers, ifc_version, file_path, ifc_theme):
+        time.sleep(self.export_seconds * len(export_file_numbers))
+        if file_path in self.failing_paths:
+            raise RuntimeError("IFC export failed: " + file_path)
+        self.exports.append((file_path, list(export_file_numbers)))
+
+
+class FakeProgressBar():
+
+    def Step(self):
+        pass
+
+    def CloseProgressbar(self):
+        pass
+
+    def IsCancelled(self):
+        return False
+
+
+class FakeAllplan():
+    """The fake services of one benchmark run, install() puts them into the wizard module"""
+
+    def __init__(self, attribute_types = None):
+        self.attribute_service = FakeAttributeService(attribute_types)
+        self.elements_attribute_service = FakeElementsAttributeService()
+
+    def install(self, wizard):
+        wizard.AllplanElementAdapter = SimpleNamespace(
+            BaseElementAdapterParentElementService=SimpleNamespace(GetParentElement=lambda element: element),
+            ReinforcementPropertiesReader=SimpleNamespace(GetPositionNumber=lambda element: element.position),
+            BaseElementAdapterChildElementsService=SimpleNamespace(GetChildElements=lambda element, recursive: element.children),
+            BaseElementAdapterList=list)
+        wizard.AllplanReinforcement = SimpleNamespace(BarPositionData=FakeBarPositionData)
+        wizard.AllplanBaseElements = SimpleNamespace(
+            AttributeService=self.attribute_service,
+            ElementsAttributeService=self.elements_attribute_service,
+            eAttibuteReadState=SimpleNamespace(ReadAll=READ_ALL, ReadAllAndComputable=READ_ALL_AND_COMPUTABLE))
+        wizard.AllplanUtil = SimpleNamespace(VecStringList=list)
+        wizard.BuildingElementAttributeList = FakeBuildingElementAttributeList
+        wizard.AllplanHelpers.doc = "document"
+        wizard.AllplanHelpers.progress_bar_finite = FakeProgressBar()
+        wizard.AllplanHelpers.attribute_catalogue = wizard.AttributeCatalogue()
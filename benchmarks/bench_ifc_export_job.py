@@ -0,0 +1,69 @@
+"""
+Benchmark of the queued IFC export (IfcExportJob and IfcExportQueue) with a fake export service, outside of Allplan.
+Measures how long CONFIRM waits for the IFC export: with the synchronous export it waits for ExportIFC, with the queued export
+only for adding the job. The queued jobs then run on the main thread, as the "Export now" button runs them. The script checks
+that they run in order, that a failing export does not stop the queue and that cancel() drops the jobs that did not run.
+
+usage: python benchmarks/bench_ifc_export_job.py [--jobs 3] [--drawing-files 10] [--export-seconds 0.05]
+"""
+
+import argparse
+import threading
+import time
+
+from allplan_fakes import FakeExportImportService, load_wizard
+
+
+def export_job(wizard, export_service, file_path, drawing_files):
+    return wizard.IfcExportJob(export_service, "document", range(1, drawing_files + 1), file_path, "Ifc_4", "theme")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=3)
+    parser.add_argument("--drawing-files", type=int, default=10)
+    parser.add_argument("--export-seconds", type=float, default=0.05, help="seconds of the fake export per drawing file")
+    args = parser.parse_args()
+    wizard = load_wizard()
+    file_paths = ["export_%d.ifc" % index for index in range(args.jobs)]
+
+    # synchronous: CONFIRM waits for every export
+    export_service = FakeExportImportService(args.export_seconds)
+    start = time.perf_counter()
+    for file_path in file_paths:
+        export_job(wizard, export_service, file_path, args.drawing_files).run()
+    synchronous_time = time.perf_counter() - start
+
+    # queued: CONFIRM only adds the job, "Export now" runs them afterwards
+    export_service = FakeExportImportService(args.export_seconds, failing_paths=[file_paths[0]])
+    queue = wizard.IfcExportQueue()
+    start = time.perf_counter()
+    for file_path in file_paths:
+        queue.add(export_job(wizard, export_service, file_path, args.drawing_files))
+    queued_time = time.perf_counter() - start
+    assert queue.get_status_text().startswith("IFC export queued")
+    jobs = list(queue.jobs)
+    start = time.perf_counter()
+    run_jobs = 0
+    while queue.run_next():
+        run_jobs = run_jobs + 1
+        assert threading.current_thread() is threading.main_thread()
+    export_now_time = time.perf_counter() - start
+    assert run_jobs == args.jobs
+    assert [file_path for file_path, _ in export_service.exports] == file_paths[1:]
+    assert jobs[0].state == wizard.IfcExportState.FAILED
+    assert all(job.state == wizard.IfcExportState.FINISHED for job in jobs[1:])
+    assert queue.get_status_text().startswith("IFC export finished")
+
+    # Esc drops the jobs that did not run
+    queue.add(export_job(wizard, export_service, "cancelled.ifc", args.drawing_files))
+    assert queue.cancel() == 1 and not queue.run_next()
+    assert queue.get_status_text() == "IFC export cancelled"
+
+    print("jobs              : %d of %d drawing files, %.3f s per drawing file" % (args.jobs, args.drawing_files, args.export_seconds))
+    print("synchronous export: CONFIRM waits %.3f s" % synchronous_time)
+    print("queued export     : CONFIRM waits %.6f s, Export now runs %d jobs in %.3f s" % (queued_time, run_jobs, export_now_time))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Micro-benchmark of the BVBS parse (bvbs_parser.parse_bvbs_lines, as the wizard parses a file), reports the parsed BVBS lines per second.
+Runs outside of Allplan: the wizard is loaded with allplan_fakes.load_wizard, parsing does not use the Allplan modules.
+
+Compare with an older version of the wizard (with its own bvbs_parser.py) by passing its module file, e.g.:
+    git worktree add ../old_wizard HEAD~1
+    python benchmarks/bench_init_from_bvbs.py --baseline ../old_wizard/BendingMachineWizard/bendingmachinewizard.py
+"""
+
+import argparse
+import random
+import time
+
+from allplan_fakes import WIZARD_PATH, load_wizard
+
+
+class Preference():
+    def __init__(self, value):
+        self.value = value
+
+
+def attribute_preferences():
+    preferences = {key: [Preference(1000 + index)] for index, key in enumerate(
+        ["rebarmark", "rebarlength", "rebardiameter", "rebarbending", "rebarassembly", "rebarcouplerstart",
+         "rebarcouplerstartfabricant", "rebarcouplerstarttype", "rebarcouplerend", "rebarcouplerendfabricant",
+         "rebarcouplerendtype", "rebaramounttotal", "rebaramountassembly", "arcradius"])}
+    preferences["rounding"] = [Preference(25)]
+    preferences["rebarlengthx"] = [Preference("rebarlength")]
+    preferences["rebaranglex"] = [Preference("rebarangle")]
+    preferences["rebarbendx"] = [Preference("rebarbendingpin")]
+    return preferences
+
+
+def bvbs_lines(amount, seed = 1):
+    rnd = random.Random(seed)
+    lines = []
+    for index in range(amount):
+        line = "BF2D@Hj@r@i@p%d@l%d@n%d@e0.5@d%d@gB500B@s40@v@a" % (index % 400 + 1, rnd.randint(300, 12000), rnd.randint(1, 40), rnd.choice([8, 10, 12, 16]))
+        if index % 4 == 0:
+            line += "@Mc1@p0@aLENTON@bA12@n1@o"
+        if index % 3 == 0:
+            line += "@PtCAGE%d" % (index % 30)
+        line += "@Gl%d@w90@l%d@r20@w-90@l%d@w0@@C%d@\n" % (rnd.randint(50, 3000), rnd.randint(50, 3000), rnd.randint(50, 3000), rnd.randint(10, 99))
+        lines.append(line)
+    return lines
+
+
+def lines_per_second(module, lines, preferences, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        # the same path as the wizard: one geometry engine for all lines, the geometry is calculated in batches
+        module.BVBSParser.parse_bvbs_lines(lines, preferences)
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return len(lines) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", help="another bendingmachinewizard.py to compare with")
+    args = parser.parse_args()
+
+    lines = bvbs_lines(args.lines)
+    preferences = attribute_preferences()
+    current = lines_per_second(load_wizard(WIZARD_PATH, "bendingmachinewizard"), lines, preferences, args.repeat)
+    print("current : %10.0f lines/s" % current)
+    if args.baseline:
+        baseline = lines_per_second(load_wizard(args.baseline, "bendingmachinewizard_baseline"), lines, preferences, args.repeat)
+        print("baseline: %10.0f lines/s  (x%.2f)" % (baseline, current / baseline))
+
+
+if __name__ == "__main__":
+    main()
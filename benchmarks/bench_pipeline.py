@@ -0,0 +1,142 @@
+"""
+Benchmark suite of the wizard stages on a synthetic BVBS corpus, outside of Allplan.
+The wizard is loaded with allplan_fakes.load_wizard and the Allplan services are replaced by the fakes in allplan_fakes.py.
+Every stage is timed separately, on 1k, 10k and 100k lines by default:
+    init_from_bvbs                                 (create_rebar_from_bending_machine_files through the RebarPipeline: parse, geometry,
+                                                    segment attributes and mark index)
+    set_corresponding_elements_on_rebarelements    (matching against one fake placement per bar)
+    calculate_total_rebar_amounts_for_assemblies
+    write_attributes_to_allplan                    (into the fake elements)
+The results are saved as JSON, pass an earlier result file with --compare to track regressions between versions:
+    python benchmarks/bench_pipeline.py --label v0.3 --output bench_v03.json
+    python benchmarks/bench_pipeline.py --compare bench_v03.json
+"""
+
+import argparse
+import datetime
+import json
+import platform
+import time
+
+import numpy as np
+from allplan_fakes import FakeAllplan, FakeElement, FakeElementAdapterType, STRING, DOUBLE, INTEGER, load_wizard
+from bvbs_corpus import bvbs_lines
+
+STAGES = ["init_from_bvbs", "set_corresponding_elements_on_rebarelements", "calculate_total_rebar_amounts_for_assemblies", "write_attributes_to_allplan"]
+ATTRIBUTE_PREFERENCES = {"rebarmark": (1000, STRING), "rebarlength": (1001, DOUBLE), "rebardiameter": (1002, DOUBLE), "rebarbending": (1003, DOUBLE),
+                         "rebarassembly": (1004, STRING), "rebarcouplerstart": (1005, STRING), "rebarcouplerstartfabricant": (1006, STRING),
+                         "rebarcouplerstarttype": (1007, STRING), "rebarcouplerend": (1008, STRING), "rebarcouplerendfabricant": (1009, STRING),
+                         "rebarcouplerendtype": (1010, STRING), "rebaramounttotal": (1011, INTEGER), "rebaramountassembly": (1012, INTEGER),
+                         "arcradius": (1013, DOUBLE)}
+
+
+def attribute_preferences(wizard):
+    preferences = {key: [wizard.AttributePreference(attribute_id)] for key, (attribute_id, _) in ATTRIBUTE_PREFERENCES.items()}
+    preferences["rounding"] = [wizard.AttributePreference(5)]
+    preferences["rebarlengthx"] = [wizard.AttributePreference("BVBS_Length_")]
+    preferences["rebaranglex"] = [wizard.AttributePreference("BVBS_Angle_")]
+    preferences["rebarbendx"] = [wizard.AttributePreference("BVBS_Bend_")]
+    return preferences
+
+
+def bar_placements(rebar_elements):
+    """ One fake placement per bar, a fifth of them placed in a polygon, and the assembly of every placement by UUID """
+    linear = FakeElementAdapterType("Linear placement", "linear")
+    polygon = FakeElementAdapterType("Place in polygon", "polygon")
+    placements = []
+    assembly_name_by_uuid = {}
+    for index, rebar_element in enumerate(rebar_elements):
+        position, _, sub_position = rebar_element.mark.value.partition(".")
+        placement = FakeElement(int(position), int(sub_position or 0), polygon if index % 5 == 0 else linear)
+        placements.append(placement)
+        if rebar_element.assembly:
+            assembly_name_by_uuid[placement.GetElementUUID()] = rebar_element.assembly.value
+    return placements, assembly_name_by_uuid
+
+
+def run_pipeline(wizard, lines):
+    fake_allplan = FakeAllplan({attribute_id: attribute_type for attribute_id, attribute_type in ATTRIBUTE_PREFERENCES.values()})
+    fake_allplan.install(wizard)
+    wizard.ReportHelper.reset()
+    preferences = attribute_preferences(wizard)
+    timings = {}
+
+    start = time.perf_counter()
+    rebar_pipeline = wizard.RebarPipeline(preferences, DOUBLE)
+    ok, rebar_elements = wizard.AllplanHelpers.create_rebar_from_bending_machine_files(lines, preferences, False, None, rebar_pipeline)
+    timings["init_from_bvbs"] = time.perf_counter() - start
+    if not ok:
+        raise RuntimeError(rebar_elements)
+    if not rebar_pipeline.segment_attributes_ok:
+        raise RuntimeError("segment attributes could not be created")
+    placements, assembly_name_by_uuid = bar_placements(rebar_elements)
+
+    start = time.perf_counter()
+    _, rebar_elements, unassigned_marks = wizard.AllplanHelpers.set_corresponding_elements_on_rebarelements(rebar_elements, placements, assembly_name_by_uuid,
+                                                                                                            rebar_pipeline.rebar_index)
+    timings["set_corresponding_elements_on_rebarelements"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rebar_elements, _ = wizard.AllplanHelpers.calculate_total_rebar_amounts_for_assemblies(rebar_elements, preferences)
+    timings["calculate_total_rebar_amounts_for_assemblies"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ok, error_message = wizard.AllplanHelpers.write_attributes_to_allplan(rebar_elements, False)
+    timings["write_attributes_to_allplan"] = time.perf_counter() - start
+    if not ok:
+        raise RuntimeError(error_message)
+
+    counters = {"bars": len(rebar_elements),
+                "unassigned_placements": len(unassigned_marks or []),
+                "change_attributes_calls": fake_allplan.elements_attribute_service.calls,
+                "written_attributes": fake_allplan.elements_attribute_service.written_attributes,
+                "attribute_service_calls": fake_allplan.attribute_service.calls}
+    return timings, counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="BVBS lines per run")
+    parser.add_argument("--repeat", type=int, default=3, help="the fastest time of the repeats is kept per stage")
+    parser.add_argument("--wizard", default=None, help="another bendingmachinewizard.py to benchmark")
+    parser.add_argument("--label", default="", help="name of the measured version, saved with the results")
+    parser.add_argument("--output", default="bench_pipeline.json")
+    parser.add_argument("--compare", help="earlier result file to compare with")
+    args = parser.parse_args()
+
+    wizard = load_wizard(args.wizard) if args.wizard else load_wizard()
+    results = []
+    for size in args.sizes:
+        lines = bvbs_lines(size)
+        best = {}
+        for _ in range(args.repeat):
+            timings, counters = run_pipeline(wizard, lines)
+            best = {stage: min(timings[stage], best.get(stage, timings[stage])) for stage in STAGES}
+        results.append({"lines": size, "seconds": best, "counters": counters})
+        print("%d lines" % size)
+        for stage in STAGES:
+            print("    %-46s %8.3f s" % (stage, best[stage]))
+
+    report = {"label": args.label,
+              "created": datetime.datetime.now().isoformat(timespec="seconds"),
+              "python": platform.python_version(),
+              "numpy": np.__version__,
+              "platform": platform.platform(),
+              "repeat": args.repeat,
+              "results": results}
+    with open(args.output, "w", encoding="utf-8") as output_file:
+        json.dump(report, output_file, indent=1)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as compare_file:
+            previous = {result["lines"]: result["seconds"] for result in json.load(compare_file)["results"]}
+        for result in results:
+            if result["lines"] not in previous:
+                continue
+            print("%d lines, compared with %s" % (result["lines"], args.compare))
+            for stage in STAGES:
+                print("    %-46s x%.2f" % (stage, result["seconds"][stage] / max(previous[result["lines"]][stage], 1e-9)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Regression benchmark for the detection of "Place in polygon" placements that have not been unlinked.
+Times AllplanHelpers.get_polygonal_placements_not_unlinked against the former nested startswith loop
+on thousands of placement marks, and checks that marks sharing a prefix ("1" and "10") are kept apart.
+
+usage: python benchmarks/bench_polygon_placements.py [--placements 5000]
+"""
+
+import argparse
+import random
+import time
+
+from allplan_fakes import load_wizard
+
+
+def legacy_polygonal_placements_not_unlinked(placement_marks):
+    global_marks = [placement_mark.split(".")[0] for placement_mark in placement_marks]
+    not_unlinked = []
+    for placement_global_mark in global_marks:
+        times_placement_found = set()
+        for placement_mark in placement_marks:
+            if placement_mark.startswith(placement_global_mark):
+                times_placement_found.add(placement_mark)
+        if len(times_placement_found) == 1:
+            not_unlinked.append(placement_global_mark + ".1")
+    return set(not_unlinked)
+
+
+def polygon_marks(amount, first_position, seed = 1):
+    """ marks of polygon placements, about a third of the positions is not unlinked (only subposition 1) """
+    rnd = random.Random(seed)
+    marks = []
+    position = first_position
+    while len(marks) < amount:
+        subpositions = 1 if rnd.random() < 0.3 else rnd.randint(2, 6)
+        marks.extend(str(position) + "." + str(subposition) for subposition in range(1, subpositions + 1))
+        position += 1
+    return marks[:amount]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--placements", type=int, default=5000)
+    args = parser.parse_args()
+    helpers = load_wizard().AllplanHelpers
+
+    # marks sharing a prefix: 1 is not unlinked, 10 is unlinked
+    assert helpers.get_polygonal_placements_not_unlinked(["1.1", "10.1", "10.2"]) == {"1.1"}
+    assert helpers.get_polygonal_placements_not_unlinked(["1", "2.1", "2.1"]) == {"1.1", "2.1"}
+
+    # same number of digits for all positions, so the former prefix check gives the same result
+    marks = polygon_marks(args.placements, 10 ** len(str(args.placements)))
+    start = time.perf_counter()
+    grouped = helpers.get_polygonal_placements_not_unlinked(marks)
+    grouped_time = time.perf_counter() - start
+    start = time.perf_counter()
+    legacy = legacy_polygonal_placements_not_unlinked(marks)
+    legacy_time = time.perf_counter() - start
+    assert grouped == legacy
+
+    print("placements        : %d (%d not unlinked)" % (len(marks), len(grouped)))
+    print("grouped           : %.4f s" % grouped_time)
+    print("nested startswith : %.4f s  (x%.0f)" % (legacy_time, legacy_time / max(grouped_time, 1e-9)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Synthetic BVBS corpus for the benchmarks.
+Every line is a valid BF2D or BF3D definition, the mix covers the parser paths: arcs, bending pins, zero length
+segments, couplers at the start and/or end, assemblies and sub positions. The corpus is reproducible by its seed.
+
+    python benchmarks/bvbs_corpus.py 10000 > corpus.abs
+"""
+
+import random
+import sys
+
+ASSEMBLIES = 200 # assembly names CAGE1..CAGE200
+COUPLER_TYPES = ["LENTON A12", "LENTON B", "ANCON X1", "ANCON X2"]
+
+
+def bvbs_line(rnd, index):
+    position = index % 2000 + 1
+    mark = str(position) if rnd.random() < 0.8 else str(position) + "." + str(rnd.randint(1, 4))
+    diameter = rnd.choice([8, 10, 12, 16, 20, 25, 32])
+    header = "@Hj@r@i@p%s@l%d@n%d@e0.5@d%d@gB500B@s%d@v@a" % (mark, rnd.randint(300, 12000), rnd.randint(1, 40), diameter, diameter * 4)
+    blocks = ""
+    if rnd.random() < 0.15:
+        start_type = rnd.choice(COUPLER_TYPES)
+        end_type = rnd.choice(COUPLER_TYPES)
+        blocks += "@Mc%d@p%d@a%s@b%s@n%s@o%s" % (rnd.randint(0, 1), rnd.randint(0, 1), start_type.split()[0], start_type, end_type.split()[0], end_type)
+    if rnd.random() < 0.3:
+        blocks += "@PtCAGE%d" % rnd.randint(1, ASSEMBLIES)
+
+    if rnd.random() < 0.3:
+        geometry = "@G"
+        for _ in range(rnd.randint(2, 6)):
+            geometry += "x%d@y%d@z%d@" % (rnd.randint(-900, 900), rnd.randint(-900, 900), rnd.randint(1, 900))
+        return "BF3D" + header + blocks + geometry + "@C%d@\n" % rnd.randint(10, 99)
+
+    geometry = "@G"
+    segments = rnd.randint(1, 6)
+    for segment in range(segments):
+        geometry += "l%d@" % (0 if rnd.random() < 0.05 else rnd.randint(50, 3000))
+        shape = rnd.random()
+        if shape < 0.1:
+            geometry += "r%d@" % rnd.randint(401, 3000) # arc, the angle of the arc follows
+        elif shape < 0.25:
+            geometry += "r%d@" % rnd.randint(10, 200) # bending pin
+        geometry += "w%d@" % (0 if segment == segments - 1 else rnd.choice([-135, -90, -45, 45, 90, 135]))
+    return "BF2D" + header + blocks + geometry + "@C%d@\n" % rnd.randint(10, 99)
+
+
+def bvbs_lines(amount, seed = 1):
+    rnd = random.Random(seed)
+    return [bvbs_line(rnd, index) for index in range(amount)]
+
+
+if __name__ == "__main__":
+    sys.stdout.writelines(bvbs_lines(int(sys.argv[1]) if len(sys.argv) > 1 else 1000))
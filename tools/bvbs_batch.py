@@ -0,0 +1,194 @@
+"""
+Processes archived BVBS exports in bulk, without Allplan.
+Runs the stages of the wizard that do not need the Allplan API, one worker process per BVBS file:
+    import_bending_machine_files -> init_from_bvbs -> segment attribute naming -> coupler lengths -> assembly totals
+The Allplan elements are not available, so bars are not matched and nothing is written into a drawing. The results per
+bar and the timings per stage are written to JSON or CSV.
+
+The attribute mapping profile is a JSON object with the same preferences as the palette, e.g.:
+    {"rebarmark": 1000, "rebarlength": 1001, "rebardiameter": 1002, "rebarbending": 1003, "rebarassembly": 1004,
+     "rebarcouplerstart": 1005, "rebarcouplerstartfabricant": 1006, "rebarcouplerstarttype": 1007,
+     "rebarcouplerend": 1008, "rebarcouplerendfabricant": 1009, "rebarcouplerendtype": 1010,
+     "rebaramounttotal": 1011, "rebaramountassembly": 1012, "arcradius": 1013, "rounding": 5,
+     "rebarlengthx": "BVBS_Length_", "rebaranglex": "BVBS_Angle_", "rebarbendx": "BVBS_Bend_"}
+Segment attributes are created by name in Allplan, headless they are reported by their attribute name.
+
+The fixture length table is a JSON object {coupler type: fixture length in mm}, the type is the BVBS coupler type
+of the start or end of the bar. Bars with a coupler type that is not in the table keep their segment lengths.
+
+    python tools/bvbs_batch.py exports/*.abs --profile profile.json --fixtures fixtures.json --output results --format csv
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
+
+from allplan_fakes import load_wizard
+
+PROFILE_KEYS = ["rebarmark", "rebarlength", "rebardiameter", "rebarbending", "rebarlengthx", "rebaranglex", "rebarbendx",
+                "rebarassembly", "rebarcouplerstart", "rebarcouplerstartfabricant", "rebarcouplerstarttype", "rebarcouplerend",
+                "rebarcouplerendfabricant", "rebarcouplerendtype", "rebaramounttotal", "rebaramountassembly", "rounding", "arcradius"]
+STAGES = ["import", "parse", "segment_attributes", "couplers", "assembly_totals"]
+
+
+def read_profile(profile_path):
+    with open(profile_path, "r", encoding="utf-8") as profile_file:
+        profile = json.load(profile_file)
+    missing_keys = [key for key in PROFILE_KEYS if key not in profile]
+    if missing_keys:
+        raise ValueError("attribute mapping profile is missing: " + ", ".join(missing_keys))
+    return profile
+
+
+def read_fixture_lengths(fixtures_path):
+    if not fixtures_path:
+        return {}
+    with open(fixtures_path, "r", encoding="utf-8") as fixtures_file:
+        return {str(coupler_type): float(length) for coupler_type, length in json.load(fixtures_file).items()}
+
+
+def adjust_coupler_lengths(rebar_elements, fixture_lengths):
+    """ Same adjustment as in Allplan, with the fixture lengths from the table instead of the fixture symbols.
+    Returns the amount of adjusted bars and of bars with a coupler type that is not in the table.
+    """
+    adjusted = 0
+    unknown = 0
+    for rebar_element in rebar_elements:
+        if not (rebar_element.coupler_start or rebar_element.coupler_end):
+            continue
+        fixture_lengths_per_end = []
+        for flag, coupler_type in ((rebar_element.coupler_start, rebar_element.coupler_start_type),
+                                   (rebar_element.coupler_end, rebar_element.coupler_end_type)):
+            if flag is None or flag.value != "True":
+                fixture_lengths_per_end.append(0)
+                continue
+            fixture_lengths_per_end.append(fixture_lengths.get(coupler_type.value if coupler_type else None))
+        if None in fixture_lengths_per_end:
+            unknown = unknown + 1
+            continue
+        if rebar_element.apply_coupler_fixture_lengths(*fixture_lengths_per_end):
+            adjusted = adjusted + 1
+    return adjusted, unknown
+
+
+def process_file(file_path, profile, fixture_lengths, encoding):
+    """ Runs in a worker process, returns the results of one BVBS file """
+    wizard = load_wizard()
+    helpers = wizard.AllplanHelpers
+    wizard.ReportHelper.reset()
+    attribute_preferences = {key: [wizard.AttributePreference(value)] for key, value in profile.items()}
+    timings = {}
+    result = {"file": str(file_path), "ok": False, "error": None, "timings": timings, "report": {}, "bars": []}
+    try:
+        start = time.perf_counter()
+        ok, bvbs_data_lines = helpers.import_bending_machine_files(str(file_path), encoding)
+        if not ok:
+            raise ValueError("BVBS file could not be opened")
+        bvbs_data_lines = list(bvbs_data_lines)
+        timings["import"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        ok, rebar_elements = helpers.create_rebar_from_bending_machine_files(bvbs_data_lines, attribute_preferences)
+        if not ok:
+            raise ValueError(helpers.get_exception_message(rebar_elements))
+        timings["parse"] = time.perf_counter() - start
+
+        # headless, the segment attributes keep their name as attribute ID
+        start = time.perf_counter()
+        attribute_definitions, segment_attribute_names = helpers.get_segment_attribute_names(rebar_elements, attribute_preferences)
+        helpers.set_segment_attribute_ids(rebar_elements, segment_attribute_names, {name: name for name in attribute_definitions})
+        timings["segment_attributes"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        adjusted, unknown = adjust_coupler_lengths(rebar_elements, fixture_lengths)
+        wizard.ReportHelper.save("Bars with adjusted coupler lengths", str(adjusted))
+        wizard.ReportHelper.save("Bars with unknown coupler fixture length", str(unknown))
+        timings["couplers"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        rebar_elements, _ = helpers.calculate_total_rebar_amounts_for_assemblies(rebar_elements, attribute_preferences)
+        timings["assembly_totals"] = time.perf_counter() - start
+
+        for line_number, rebar_element in enumerate(rebar_elements, 1):
+            result["bars"].append({
+                "line": line_number,
+                "shape": rebar_element.shape_type.name if rebar_element.shape_type else None,
+                "attributes": {str(attribute.allplan_attribute_id): attribute.value for attribute in rebar_element.get_attributes_as_list() if attribute}})
+        result["ok"] = True
+    except Exception as exc:
+        result["error"] = str(exc)
+    result["report"] = {report_element.name: report_element.value for report_element in wizard.ReportHelper.get()}
+    timings["total"] = sum(timings.values())
+    return result
+
+
+def write_json(result, output_dir):
+    with open(output_dir / (Path(result["file"]).stem + ".json"), "w", encoding="utf-8") as result_file:
+        json.dump(result, result_file, indent=1)
+
+
+def write_csv(result, output_dir):
+    columns = []
+    for bar in result["bars"]:
+        columns.extend(column for column in bar["attributes"] if column not in columns)
+    with open(output_dir / (Path(result["file"]).stem + ".csv"), "w", encoding="utf-8", newline="") as result_file:
+        writer = csv.writer(result_file)
+        writer.writerow(["line", "shape"] + columns)
+        for bar in result["bars"]:
+            writer.writerow([bar["line"], bar["shape"]] + [bar["attributes"].get(column, "") for column in columns])
+
+
+def write_timings(results, output_dir, output_format):
+    rows = [{"file": result["file"], "ok": result["ok"], "error": result["error"], "bars": len(result["bars"]),
+             **{stage: result["timings"].get(stage) for stage in STAGES + ["total"]}} for result in results]
+    if output_format == "json":
+        with open(output_dir / "timings.json", "w", encoding="utf-8") as timings_file:
+            json.dump(rows, timings_file, indent=1)
+        return
+    with open(output_dir / "timings.csv", "w", encoding="utf-8", newline="") as timings_file:
+        writer = csv.DictWriter(timings_file, fieldnames=list(rows[0].keys()) if rows else ["file"])
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", help="BVBS files")
+    parser.add_argument("--profile", required=True, help="JSON attribute mapping profile")
+    parser.add_argument("--fixtures", help="JSON table {coupler type: fixture length}")
+    parser.add_argument("--output", default="bvbs_results", help="output folder")
+    parser.add_argument("--format", choices=["json", "csv"], default="json")
+    parser.add_argument("--encoding", default="cp1252")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    profile = read_profile(args.profile)
+    fixture_lengths = read_fixture_lengths(args.fixtures)
+    output_dir = Path(args.output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    files = [Path(file_path) for file_path in args.files]
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(files)))) as executor:
+        results = list(executor.map(process_file, files, [profile] * len(files), [fixture_lengths] * len(files), [args.encoding] * len(files)))
+    for result in results:
+        if args.format == "json":
+            write_json(result, output_dir)
+        else:
+            write_csv(result, output_dir)
+        status = "ok" if result["ok"] else "error: " + result["error"]
+        print("%s: %d bars in %.2fs, %s" % (result["file"], len(result["bars"]), result["timings"]["total"], status))
+    write_timings(results, output_dir, args.format)
+    print("%d files in %.2fs" % (len(files), time.perf_counter() - start))
+    return 0 if all(result["ok"] for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())